@@ -1,14 +1,31 @@
 import streamlit as st
 import pandas as pd
+import numpy as np
 import pygsheets
 import plotly.express as px
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 import re
 import io
+import time
 from datetime import datetime
 from streamlit_autorefresh import st_autorefresh
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+from theme import THEME_CSS
+import threading
+from concurrent.futures import ThreadPoolExecutor
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from charset_normalizer import from_bytes
+from google.auth.exceptions import GoogleAuthError
+from google.auth.transport.requests import Request as GoogleAuthRequest
+
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pacsv
+except ImportError:  # downloads fall back to pandas' to_csv
+    pa = None
 
 # ===================== CONFIG =====================
 SPREADSHEET_ID = "1dWv4kVugXNFQ2NaodZkawaXRglqRJOWR"
@@ -18,6 +35,27 @@ SHEET_NAME = "Pri Payment"
 PROPOSAL_SHEET_NAME = "Proposals"
 SERVICE_FILE = "service_account.json"
 
+# Sheet data is cached per data version (the sheet's Drive modified time), so it
+# only reloads when the sheet changes. An export can lag the edit that bumped the
+# version, so DATA_TTL keeps such a stale copy from staying pinned for long.
+# Without a service account the version falls back to a FALLBACK_REFRESH bucket.
+# A failed load is not cached as data; it is remembered for FALLBACK_REFRESH
+# seconds per version, and meanwhile the last good data (or the fallback) is served.
+DATA_TTL = 600
+FALLBACK_REFRESH = 120
+
+# The authorised client and opened spreadsheet are re-created at least this often,
+# so rotated keys and added/renamed worksheets are picked up without a restart
+SESSION_TTL = 3600
+
+# One pooled HTTP session so CSV fetches reuse the TLS connection; transient
+# rate limits and 5xx answers are retried with backoff before trying the next URL.
+# Timeouts are not retried (one connect retry only): each attempt may wait 30 s.
+_RETRY = Retry(total=3, connect=1, read=0, backoff_factor=1,
+               status_forcelist=[429, 500, 502, 503, 504], allowed_methods=["GET"])
+_SESSION = requests.Session()
+_SESSION.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=4, max_retries=_RETRY))
+
 st.set_page_config(page_title="Payment Dashboard", layout="wide")
 
 # ===================== AUTO REFRESH SETTINGS =====================
@@ -29,292 +67,347 @@ interval = st.sidebar.number_input("Refresh Interval (seconds)", 10, 300, 60)
 if enable_auto:
     st_autorefresh(interval=interval * 1000, key="auto_refresh")
 
+# Debug output in the sidebar is opt-in so normal reruns skip it
+DEBUG = st.sidebar.checkbox("Debug logs", value=False)
+
 # ===================== CUSTOM CSS FOR DARK THEME =====================
-st.markdown("""
-<style>
-    .main .block-container { padding-top: 2rem; background-color: #0E1117; }
-    .metric-card { background: linear-gradient(135deg, #1E293B 0%, #334155 100%); padding: 1.5rem; border-radius: 12px; border: 1px solid #374151; box-shadow: 0 4px 6px -1px rgba(0, 0, 0, 0.3); margin-bottom: 1rem; }
-    .metric-card:hover { transform: translateY(-2px); box-shadow: 0 6px 8px -1px rgba(0, 0, 0, 0.4); }
-    .metric-title { font-size: 0.9rem; font-weight: 600; color: #94A3B8; margin-bottom: 0.5rem; text-transform: uppercase; letter-spacing: 0.5px; }
-    .metric-value { font-size: 1.8rem; font-weight: 700; color: #FFFFFF; margin-bottom: 0; }
-    .section-header { font-size: 1.4rem; font-weight: 700; color: #FFFFFF; margin: 2rem 0 1rem 0; padding-bottom: 0.5rem; border-bottom: 2px solid #374151; }
-    .status-summary { background: #1E293B; padding: 1.5rem; border-radius: 12px; border: 1px solid #374151; margin-bottom: 1rem; }
-    .status-item { display: flex; justify-content: space-between; padding: 0.5rem 0; border-bottom: 1px solid #374151; }
-    .status-item:last-child { border-bottom: none; }
-    .chart-container { background: #1E293B; padding: 1.5rem; border-radius: 12px; border: 1px solid #374151; margin-bottom: 1rem; }
-    .kpi-row { display: flex; gap: 1rem; margin-bottom: 2rem; }
-    /* Proposal status colors */
-    .status-approved { color: #10B981; font-weight: bold; }
-    .status-pending { color: #F59E0B; font-weight: bold; }
-    .status-rejected { color: #EF4444; font-weight: bold; }
-    .status-review { color: #8B5CF6; font-weight: bold; }
-    .status-ok { color: #10B981; font-weight: bold; }
-    .status-drop { color: #EF4444; font-weight: bold; }
-    .status-ongoing { color: #3B82F6; font-weight: bold; }
-    .status-others { color: #6B7280; font-weight: bold; }
-    .status-followup { color: #F59E0B; font-weight: bold; }
-</style>
-""", unsafe_allow_html=True)
+# Streamlit drops elements a rerun does not redraw, so the stylesheet is emitted every run
+st.markdown(THEME_CSS, unsafe_allow_html=True)
 
 # ===================== DATA LOADING FUNCTIONS =====================
-def clean_colname(x):
-    x = str(x).strip().lower()
-    x = re.sub(r"[^0-9a-zA-Z_ ]", "", x)
-    x = x.replace(" ", "_")
-    return x if x else "col"
-
-def safe_num(v):
-    """Enhanced number conversion for Indian currency format"""
+_COLCLEAN = re.compile(r"[^0-9a-zA-Z_ ]")
+
+def clean_colnames(columns):
+    """Normalise all column names in one pass over the Index"""
+    cleaned = (
+        pd.Index(columns).astype(str)
+        .str.strip()
+        .str.lower()
+        .str.replace(_COLCLEAN, "", regex=True)
+        .str.replace(" ", "_", regex=False)
+    )
+    return cleaned.where(cleaned != "", "col")
+
+def promote_header(rows):
+    """Use the first row of a headerless frame as the column names"""
+    # One policy for the CSV parsers and the API path: like get_all_records, the
+    # last of any duplicate header wins; blank-header columns and blank rows are dropped
+    if rows.empty:
+        return pd.DataFrame()
+    
+    header = pd.Index(rows.iloc[0].fillna('').astype(str))
+    df = rows.iloc[1:].set_axis(header, axis=1)
+    df = df.loc[:, ~(header.duplicated(keep='last') | (header.str.strip() == ''))]
+    df = df[~(df.isna() | (df == '')).all(axis=1)]
+    return df.fillna('').reset_index(drop=True)
+
+_CURRENCY_RE = re.compile(r'[₹$,\s]')
+_PAREN_NEG_RE = re.compile(r'^\((.*)\)$')
+
+def vec_safe_num(s):
+    """Enhanced number conversion for Indian currency format, applied to a whole column"""
+    # Parse each distinct raw value once; ledgers repeat amounts a lot
+    codes, uniques = pd.factorize(s)
+    u = pd.Series(uniques, dtype=object)
+    
+    # Remove currency symbols, commas, and spaces
+    u = u.astype('string').str.strip().str.replace(_CURRENCY_RE, '', regex=True)
+    
+    # Handle negative numbers in parentheses
+    u = u.str.replace(_PAREN_NEG_RE, r'-\1', regex=True)
+    
+    # Convert to float, anything unparseable (or missing) becomes 0
+    parsed = pd.to_numeric(u, errors='coerce').astype(float).fillna(0.0).to_numpy()
+    values = np.append(parsed, 0.0)[codes]  # code -1 (missing) picks the trailing 0.0
+    return pd.Series(values, index=s.index, name=s.name)
+
+def to_arrow_strings(df, columns):
+    """Store free-text columns as Arrow strings (one buffer, not a PyObject per cell)"""
+    if pa is None:
+        return df
+    for col in columns:
+        if col in df.columns:
+            df[col] = df[col].astype('string[pyarrow]')
+    return df
+
+def norm_text(s, fill='Unknown', title=True):
+    """Strip (and title-case) a text column, transforming each distinct value only once"""
+    mapping = {v: str(v).strip().title() if title else str(v).strip() for v in s.dropna().unique()}
+    return s.map(mapping).fillna(fill)
+
+# Layouts the sheet usually exports; an exact format parses in one C pass
+DATE_FORMATS = ['%d/%m/%Y', '%d-%m-%Y']
+
+def parse_dates(s):
+    """Parse a whole date column, day-first like the sheet"""
+    filled = s.notna() & (s != '')
+    for fmt in DATE_FORMATS:
+        parsed = pd.to_datetime(s, format=fmt, errors="coerce", cache=True)
+        if not (parsed.isna() & filled).any():
+            return parsed
+    
+    # Mixed or unexpected layouts: per-value inference
+    return pd.to_datetime(s, dayfirst=True, errors="coerce", format="mixed", cache=True)
+
+# ===================== SHARED SPREADSHEET SESSION =====================
+# One authorised client serves the payment and proposal loaders and the freshness
+# check. pygsheets talks through httplib2, which is not thread-safe, so every call
+# on it (and the token refresh) goes through the lock; CSV downloads run outside it.
+@st.cache_resource(ttl=SESSION_TTL)
+def _get_gspread_client():
+    """Authorize the service account once per process"""
+    return pygsheets.authorize(service_file=SERVICE_FILE)
+
+@st.cache_resource(ttl=SESSION_TTL)
+def _open_spreadsheet():
+    """Open the spreadsheet once per process"""
+    # Open by ID (most reliable method)
+    return _get_gspread_client().open_by_key(SPREADSHEET_ID)
+
+@st.cache_resource
+def _sheet_lock():
+    """Lock serialising use of the shared client across threads and sessions"""
+    return threading.Lock()
+
+@st.cache_data(ttl=30, show_spinner=False)
+def sheet_modified_time():
+    """Spreadsheet's last-modified time from Drive (one metadata call), or None"""
     try:
-        if pd.isna(v) or v == "" or str(v).strip() == "":
-            return 0.0
-        
-        # Convert to string and clean
-        v_str = str(v).strip()
-        
-        # Remove currency symbols, commas, and spaces
-        v_clean = re.sub(r'[₹$,\\s]', '', v_str)
-        
-        # Handle negative numbers in parentheses
-        if v_clean.startswith('(') and v_clean.endswith(')'):
-            v_clean = '-' + v_clean[1:-1]
-        
-        # Convert to float
-        return float(v_clean) if v_clean else 0.0
-        
-    except Exception as e:
-        return 0.0
+        with _sheet_lock():
+            return _open_spreadsheet().updated
+    except Exception:
+        return None
 
-def parse_date(v):
+def data_version():
+    """Cache key for the sheet data: its modified time, else the current refresh bucket"""
+    modified = sheet_modified_time()
+    if modified is not None:
+        return modified
+    return f"bucket-{int(time.time() // FALLBACK_REFRESH)}"
+
+def _export_worksheet_csv(wks):
+    """Fetch a worksheet through the CSV export endpoint, authorised as the service account"""
+    with _sheet_lock():
+        credentials = _get_gspread_client().oauth
+        if not credentials.valid:
+            credentials.refresh(GoogleAuthRequest())
+        token = credentials.token
+    
+    url = f"https://docs.google.com/spreadsheets/d/{SPREADSHEET_ID}/export?format=csv&gid={wks.id}"
+    response = _SESSION.get(url, headers={'Authorization': f'Bearer {token}'}, timeout=30)
+    response.raise_for_status()
+    
+    # A rejected token ends on an HTML sign-in page rather than an error status
+    if not response.headers.get('Content-Type', '').startswith('text/csv'):
+        raise ValueError("export did not return CSV")
+    return _read_csv_body(response.content, detect_encoding(response.content))
+
+def worksheet_to_df(wks, log):
+    """Fetch a worksheet as one CSV export, or failing that one values call"""
+    # The export is a single response parsed in C; the API path builds Python lists.
+    # Network, token and non-CSV/parse failures fall back; anything else is a bug
     try:
-        return pd.to_datetime(v, dayfirst=True, errors="coerce")
-    except:
-        return pd.NaT
+        return _export_worksheet_csv(wks)
+    except (requests.RequestException, GoogleAuthError, ValueError) as e:
+        log.append(("warning", f"⚠️ CSV export of '{wks.title}' skipped ({type(e).__name__}: {e}), reading via the Sheets API"))
+    
+    with _sheet_lock():
+        values = wks.get_all_values(returnas='matrix', include_tailing_empty=False,
+                                    include_tailing_empty_rows=False)
+    if not values:
+        return pd.DataFrame()
+    
+    # Short rows are padded with NaN; cells past the header width land under blank names
+    return promote_header(pd.DataFrame(values))
 
 # ===================== LOAD PAYMENT DATA VIA SERVICE ACCOUNT =====================
-@st.cache_data(ttl=120)
-def load_via_service():
+def load_via_service(log):
     try:
-        gc = pygsheets.authorize(service_file=SERVICE_FILE)
-        
-        # Open by ID (most reliable method)
-        sh = gc.open_by_key(SPREADSHEET_ID)
-        st.sidebar.success(f"📊 Opened: {sh.title}")
-        
-        # Try to get the specific sheet by GID
-        try:
-            wks = sh.worksheet(property='id', value=SHEET_GID)
-            st.sidebar.info(f"📑 Using sheet: {wks.title} (GID: {SHEET_GID})")
-        except:
-            # Fallback to first sheet
-            wks = sh[0]
-            st.sidebar.warning(f"⚠️ Using first sheet: {wks.title}")
+        with _sheet_lock():
+            sh = _open_spreadsheet()
+            log.append(("success", f"📊 Opened: {sh.title}"))
+            
+            # Try to get the specific sheet by GID
+            try:
+                wks = sh.worksheet(property='id', value=SHEET_GID)
+                log.append(("info", f"📑 Using sheet: {wks.title} (GID: {SHEET_GID})"))
+            except:
+                # Fallback to first sheet
+                wks = sh[0]
+                log.append(("warning", f"⚠️ Using first sheet: {wks.title}"))
         
         # Get all data
-        data = wks.get_all_records()
-        df = pd.DataFrame(data)
+        df = worksheet_to_df(wks, log)
         
         if df.empty:
-            st.sidebar.warning("📭 Loaded empty dataframe")
+            log.append(("warning", "📭 Loaded empty dataframe"))
             return None
-            
-        st.sidebar.success(f"✅ Loaded {len(df)} records via Service Account")
+        
+        log.append(("success", f"✅ Loaded {len(df)} records via Service Account"))
         return df
         
     except Exception as e:
-        st.sidebar.error(f"❌ Service Account failed: {str(e)}")
+        log.append(("error", f"❌ Service Account failed: {str(e)}"))
         return None
 
 # ===================== LOAD PROPOSAL DATA =====================
-@st.cache_data(ttl=120)
-def load_proposal_data():
+def load_proposal_data(log):
     """Load proposal data from Google Sheets"""
     try:
-        gc = pygsheets.authorize(service_file=SERVICE_FILE)
-        sh = gc.open_by_key(SPREADSHEET_ID)
-        st.sidebar.success(f"📊 Opened spreadsheet: {sh.title}")
-
-        # Debug: List all worksheets
-        st.sidebar.info(f"📑 Available worksheets in '{sh.title}':")
-        worksheets = sh.worksheets()
-        for i, ws in enumerate(worksheets):
-            st.sidebar.info(f"  {i+1}. {ws.title} (ID: {ws.id})")
-        
-        # Try to get proposal sheet by GID
-        try:
-            st.sidebar.info(f"🔍 Looking for sheet with GID: {PROPOSAL_GID}")
-            proposal_wks = sh.worksheet(property='id', value=PROPOSAL_GID)
-            st.sidebar.success(f"✅ Found proposal sheet: {proposal_wks.title} (GID: {PROPOSAL_GID})")
-        except Exception as e:
-            st.sidebar.warning(f"⚠️ Could not find sheet by GID {PROPOSAL_GID}: {str(e)}")
+        with _sheet_lock():
+            sh = _open_spreadsheet()
+            log.append(("success", f"📊 Opened spreadsheet: {sh.title}"))
+
+            # Debug: List all worksheets
+            log.append(("debug", f"📑 Available worksheets in '{sh.title}':"))
+            worksheets = sh.worksheets()
+            for i, ws in enumerate(worksheets):
+                log.append(("debug", f"  {i+1}. {ws.title} (ID: {ws.id})"))
             
-            # Fallback to sheet name
+            # Try to get proposal sheet by GID
             try:
-                st.sidebar.info(f"🔍 Looking for sheet by name: {PROPOSAL_SHEET_NAME}")
-                proposal_wks = sh.worksheet_by_title(PROPOSAL_SHEET_NAME)
-                st.sidebar.success(f"✅ Found proposal sheet by name: {proposal_wks.title}")
-            except Exception as e2:
-                st.sidebar.error(f"❌ Could not find proposal sheet by name '{PROPOSAL_SHEET_NAME}': {str(e2)}")
-                
-                # Try to find any sheet with "proposal" in the name
-                st.sidebar.info("🔍 Searching for sheets with 'proposal' in name...")
-                matching_sheets = [ws for ws in worksheets if 'proposal' in ws.title.lower()]
-                if matching_sheets:
-                    proposal_wks = matching_sheets[0]
-                    st.sidebar.success(f"✅ Using sheet: {proposal_wks.title}")
-                else:
-                    st.sidebar.error("❌ No proposal sheet found")
-                    return None
-        
+                log.append(("info", f"🔍 Looking for sheet with GID: {PROPOSAL_GID}"))
+                proposal_wks = sh.worksheet(property='id', value=PROPOSAL_GID)
+                log.append(("success", f"✅ Found proposal sheet: {proposal_wks.title} (GID: {PROPOSAL_GID})"))
+            except Exception as e:
+                log.append(("warning", f"⚠️ Could not find sheet by GID {PROPOSAL_GID}: {str(e)}"))
+            
+                # Fallback to sheet name
+                try:
+                    log.append(("info", f"🔍 Looking for sheet by name: {PROPOSAL_SHEET_NAME}"))
+                    proposal_wks = sh.worksheet_by_title(PROPOSAL_SHEET_NAME)
+                    log.append(("success", f"✅ Found proposal sheet by name: {proposal_wks.title}"))
+                except Exception as e2:
+                    log.append(("error", f"❌ Could not find proposal sheet by name '{PROPOSAL_SHEET_NAME}': {str(e2)}"))
+            
+                    # Try to find any sheet with "proposal" in the name
+                    log.append(("info", "🔍 Searching for sheets with 'proposal' in name..."))
+                    matching_sheets = [ws for ws in worksheets if 'proposal' in ws.title.lower()]
+                    if matching_sheets:
+                        proposal_wks = matching_sheets[0]
+                        log.append(("success", f"✅ Using sheet: {proposal_wks.title}"))
+                    else:
+                        log.append(("error", "❌ No proposal sheet found"))
+                        return None
+            
         # Get all proposal data
-        st.sidebar.info("📥 Fetching proposal data...")
-        proposal_data = proposal_wks.get_all_records()
-        proposal_df = pd.DataFrame(proposal_data)
+        log.append(("info", "📥 Fetching proposal data..."))
+        proposal_df = worksheet_to_df(proposal_wks, log)
         
         if proposal_df.empty:
-            st.sidebar.warning("📭 Loaded empty proposal dataframe")
+            log.append(("warning", "📭 Loaded empty proposal dataframe"))
             return None
-            
-        st.sidebar.success(f"✅ Loaded {len(proposal_df)} proposal records")
+        
+        log.append(("success", f"✅ Loaded {len(proposal_df)} proposal records"))
         
         # Debug: Show column names
-        st.sidebar.info("📋 Proposal columns found:")
+        log.append(("debug", "📋 Proposal columns found:"))
         for col in proposal_df.columns:
-            st.sidebar.info(f"  - {col}")
-            
+            log.append(("debug", f"  - {col}"))
+        
         return proposal_df
         
     except Exception as e:
-        st.sidebar.error(f"❌ Failed to load proposal data: {str(e)}")
+        log.append(("error", f"❌ Failed to load proposal data: {str(e)}"))
         return None
 
-# ===================== ENHANCED CSV LOADING FOR PAYMENT DATA =====================
-@st.cache_data(ttl=120)
-def load_via_csv():
-    """Load payment data via CSV export"""
+# ===================== ENHANCED CSV LOADING =====================
+def detect_encoding(body, sample_size=65536):
+    """Encoding of a CSV body: BOM, then UTF-8, then a sniff of the first bytes only"""
+    if body.startswith(b'\xef\xbb\xbf'):
+        return 'utf-8-sig'
+    if body.startswith((b'\xff\xfe', b'\xfe\xff')):
+        return 'utf-16'
     try:
-        st.sidebar.info("🔄 Trying to load payment data via CSV export...")
+        body.decode('utf-8')
+        return 'utf-8'
+    except UnicodeDecodeError:
+        match = from_bytes(body[:sample_size]).best()
+        return match.encoding if match else 'latin-1'
+
+def _read_csv_body(body, encoding):
+    """Parse a Google Sheets CSV export (raw bytes) into a string DataFrame"""
+    try:
+        # Multi-threaded native parser; blank cells come back as NaN
+        df = pd.read_csv(
+            io.BytesIO(body),
+            sep=',',
+            engine='pyarrow',
+            dtype_backend='pyarrow',
+            encoding=encoding,
+            header=None,
+            skip_blank_lines=True,
+            dtype=str
+        )
+    except Exception:
+        # Fixed dialect and the C engine pinned, read in one chunk (everything is str anyway).
+        # Same NA handling and no space stripping, so both parsers yield the same frame
+        df = pd.read_csv(
+            io.BytesIO(body),
+            sep=',',
+            engine='c',
+            low_memory=False,
+            encoding=encoding,
+            header=None,
+            skip_blank_lines=True,
+            dtype=str,
+            thousands=','
+        )
+    
+    # Read headerless so neither engine renames duplicates (the C engine adds ".1")
+    return promote_header(df)
+
+def _load_sheet_csv(gid, label, log):
+    """Load one sheet via CSV export, trying each export URL format in turn"""
+    try:
+        log.append(("info", f"🔄 Trying to load {label} data via CSV export..."))
         
         # Try different CSV URL formats
         csv_urls = [
-            f"https://docs.google.com/spreadsheets/d/{SPREADSHEET_ID}/export?format=csv&gid={SHEET_GID}",
-            f"https://docs.google.com/spreadsheets/d/{SPREADSHEET_ID}/gviz/tq?tqx=out:csv&gid={SHEET_GID}",
+            f"https://docs.google.com/spreadsheets/d/{SPREADSHEET_ID}/export?format=csv&gid={gid}",
+            f"https://docs.google.com/spreadsheets/d/{SPREADSHEET_ID}/gviz/tq?tqx=out:csv&gid={gid}",
             f"https://docs.google.com/spreadsheets/d/{SPREADSHEET_ID}/export?format=csv",
         ]
         
+        # We only fetch once the sheet version changes, so ask caches to revalidate
+        headers = {
+            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36',
+            'Cache-Control': 'no-cache'
+        }
+        
         for i, csv_url in enumerate(csv_urls):
             try:
-                st.sidebar.info(f"  Trying URL {i+1}...")
-                
-                headers = {
-                    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
-                }
-                import time
-                csv_url += f"&t={int(time.time())}"
+                log.append(("info", f"  Trying URL {i+1}..."))
                 
-                response = requests.get(csv_url, headers=headers, timeout=30)
+                response = _SESSION.get(csv_url, headers=headers, timeout=30)
                 response.raise_for_status()
                 
-                # Try different encodings
-                encodings = ['utf-8', 'latin-1', 'windows-1252', 'iso-8859-1']
+                # Detect the encoding once and hand the raw bytes straight to the parser
+                encoding = detect_encoding(response.content)
+                df = _read_csv_body(response.content, encoding)
                 
-                for encoding in encodings:
-                    try:
-                        df = pd.read_csv(
-                            io.StringIO(response.text), 
-                            encoding=encoding,
-                            skip_blank_lines=True,
-                            na_filter=False,
-                            dtype=str,
-                            thousands=',',
-                            skipinitialspace=True
-                        )
-                        
-                        df = df.dropna(how='all')
-                        df = df.loc[:, ~df.columns.str.contains('^Unnamed')]
-                        
-                        if not df.empty and len(df.columns) > 1:
-                            st.sidebar.success(f"✅ CSV loaded: {len(df)} records with encoding {encoding}")
-                            return df
-                            
-                    except UnicodeDecodeError:
-                        continue
-                    except Exception as e:
-                        continue
+                if not df.empty and len(df.columns) > 1:
+                    log.append(("success", f"✅ CSV loaded: {len(df)} records with encoding {encoding}"))
+                    return df
                         
             except Exception as e:
-                st.sidebar.warning(f"  URL {i+1} failed: {str(e)}")
+                log.append(("warning", f"  URL {i+1} failed: {str(e)}"))
                 continue
         
         return None
         
     except Exception as e:
-        st.sidebar.error(f"❌ CSV Export failed: {str(e)}")
+        log.append(("error", f"❌ CSV Export failed: {str(e)}"))
         return None
 
+def load_via_csv(log):
+    """Load payment data via CSV export"""
+    return _load_sheet_csv(SHEET_GID, "payment", log)
+
 # ===================== ENHANCED CSV LOADING FOR PROPOSALS =====================
-@st.cache_data(ttl=120)
-def load_proposal_via_csv():
+def load_proposal_via_csv(log):
     """Alternative method to load proposal data via CSV export"""
-    try:
-        st.sidebar.info("🔄 Trying to load proposal data via CSV export...")
-        
-        # Try different CSV URL formats
-        csv_urls = [
-            f"https://docs.google.com/spreadsheets/d/{SPREADSHEET_ID}/export?format=csv&gid={PROPOSAL_GID}",
-            f"https://docs.google.com/spreadsheets/d/{SPREADSHEET_ID}/gviz/tq?tqx=out:csv&gid={PROPOSAL_GID}",
-            f"https://docs.google.com/spreadsheets/d/{SPREADSHEET_ID}/export?format=csv",
-        ]
-        
-        for i, csv_url in enumerate(csv_urls):
-            try:
-                st.sidebar.info(f"  Trying URL {i+1}...")
-                
-                headers = {
-                    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
-                }
-                import time
-                csv_url += f"&t={int(time.time())}"
-                
-                response = requests.get(csv_url, headers=headers, timeout=30)
-                response.raise_for_status()
-                
-                # Try different encodings
-                encodings = ['utf-8', 'latin-1', 'windows-1252', 'iso-8859-1']
-                
-                for encoding in encodings:
-                    try:
-                        df = pd.read_csv(
-                            io.StringIO(response.text), 
-                            encoding=encoding,
-                            skip_blank_lines=True,
-                            na_filter=False,
-                            dtype=str,
-                            thousands=',',
-                            skipinitialspace=True
-                        )
-                        
-                        df = df.dropna(how='all')
-                        df = df.loc[:, ~df.columns.str.contains('^Unnamed')]
-                        
-                        if not df.empty and len(df.columns) > 1:
-                            st.sidebar.success(f"✅ CSV loaded: {len(df)} records with encoding {encoding}")
-                            return df
-                            
-                    except UnicodeDecodeError:
-                        continue
-                    except Exception as e:
-                        continue
-                        
-            except Exception as e:
-                st.sidebar.warning(f"  URL {i+1} failed: {str(e)}")
-                continue
-        
-        return None
-        
-    except Exception as e:
-        st.sidebar.error(f"❌ CSV Export failed: {str(e)}")
-        return None
+    return _load_sheet_csv(PROPOSAL_GID, "proposal", log)
 
 # ===================== DEMO DATA (Fallback for Payment only) =====================
 def load_demo_data():
@@ -332,56 +425,87 @@ def load_demo_data():
     }
     return pd.DataFrame(demo_data)
 
+# ===================== COLUMN MAPPING =====================
+# Enhanced column mapping
+PAYMENT_COLUMN_MAPPING = {
+    'unit_name': ['unit_name', 'unit', 'unitname', 'name', 'client', 'customer'],
+    'work_order_no': ['work_order_no', 'work_order', 'wo_no', 'order_no', 'workorder', 'wo_number'],
+    'order_amount': ['order_amount', 'order', 'amount', 'order_amt', 'initial_amount', 'quoted_amount'],
+    'final_amount': ['final_amount', 'final', 'final_amt', 'total_amount', 'grand_total', 'invoice_amount'],
+    'payment_received': ['payment_received', 'received', 'paid', 'payment_received', 'amount_received', 'paid_amount'],
+    'pending_amount': ['pending_amount', 'pending', 'balance', 'due_amount', 'outstanding', 'remaining'],
+    'payment_mode': ['payment_mode', 'mode', 'payment_type', 'type', 'payment_method'],
+    'work_status': ['work_status', 'status', 'job_status', 'project_status', 'completion_status'],
+    'date': ['date', 'p_date', 'payment_date', 'transaction_date', 'invoice_date', 'entry_date']
+}
+
+# Enhanced column mapping for proposals
+PROPOSAL_COLUMN_MAPPING = {
+    's_no': ['s_no', 'sno', 'sl_no', 'serial_no', 'serial_number'],
+    'year': ['year', 'yr', 'year_'],
+    'date': ['date', 'proposal_date', 'submission_date'],
+    'wo_date': ['wo_date', 'work_order_date', 'order_date'],
+    'no': ['no', 'wo_no', 'work_order_no', 'order_no'],
+    'name': ['name', 'client_name', 'company', 'customer', 'client'],
+    'industry_type': ['industry_type', 'industry', 'business_type', 'sector'],
+    'district': ['district', 'location', 'city_district', 'area'],
+    'scope_of_work': ['scope_of_work', 'scope', 'work_scope', 'description'],
+    'type': ['type', 'proposal_type', 'category'],
+    'source': ['source', 'lead_source', 'referral_source'],
+    'status': ['status', 'proposal_status', 'current_status'],
+    'refrence_no': ['refrence_no', 'reference_no', 'ref_no', 'proposal_no'],
+    'contact_person': ['contact_person', 'contact', 'person', 'representative'],
+    'amount': ['amount', 'proposal_amount', 'value', 'quoted_amount'],
+    'present_status': ['present_status', 'current_status', 'latest_status', 'status_update']
+}
+
+def rename_aliases(df, column_mapping):
+    """Rename alias columns to their standard names with a single rename call"""
+    # Aliases are listed in preference order: each missing standard name takes
+    # the first one the sheet has, exactly like renaming them one at a time
+    present = set(df.columns)
+    rename_map = {}
+    for standard_name, possible_names in column_mapping.items():
+        if standard_name in present:
+            continue
+        for possible_name in possible_names:
+            if possible_name in present:
+                rename_map[possible_name] = standard_name
+                present.discard(possible_name)
+                present.add(standard_name)
+                break
+    return df.rename(columns=rename_map), rename_map
+
 # ===================== IMPROVED DATA PROCESSING =====================
-def process_raw_data(df):
+def process_raw_data(df, log):
     """Process and clean the raw data with enhanced CSV handling"""
     # Create a clean copy
     df_clean = df.copy()
     
     # Clean column names
-    df_clean.columns = [clean_colname(c) for c in df_clean.columns]
-    
-    # Debug info
-    with st.sidebar.expander("🔍 Payment Debug Info"):
-        st.write("Original columns:", list(df.columns))
-        st.write("Cleaned columns:", list(df_clean.columns))
-        st.write("Data shape:", df_clean.shape)
-        if not df_clean.empty:
-            st.write("First 2 rows sample:", df_clean.head(2).to_dict('records'))
-    
-    # Enhanced column mapping
-    column_mapping = {
-        'unit_name': ['unit_name', 'unit', 'unitname', 'name', 'client', 'customer'],
-        'work_order_no': ['work_order_no', 'work_order', 'wo_no', 'order_no', 'workorder', 'wo_number'],
-        'order_amount': ['order_amount', 'order', 'amount', 'order_amt', 'initial_amount', 'quoted_amount'],
-        'final_amount': ['final_amount', 'final', 'final_amt', 'total_amount', 'grand_total', 'invoice_amount'],
-        'payment_received': ['payment_received', 'received', 'paid', 'payment_received', 'amount_received', 'paid_amount'],
-        'pending_amount': ['pending_amount', 'pending', 'balance', 'due_amount', 'outstanding', 'remaining'],
-        'payment_mode': ['payment_mode', 'mode', 'payment_type', 'type', 'payment_method'],
-        'work_status': ['work_status', 'status', 'job_status', 'project_status', 'completion_status'],
-        'date': ['date', 'p_date', 'payment_date', 'transaction_date', 'invoice_date', 'entry_date']
+    df_clean.columns = clean_colnames(df_clean.columns)
+    
+    # Debug details are collected here and drawn by render_payment_debug outside the cache
+    debug_info = {
+        'original_columns': list(df.columns),
+        'cleaned_columns': list(df_clean.columns),
+        'shape': df_clean.shape,
+        'sample': df_clean.head(2),
     }
     
     # Apply column mapping with feedback
-    mapped_count = 0
-    for standard_name, possible_names in column_mapping.items():
-        for possible_name in possible_names:
-            if possible_name in df_clean.columns and standard_name not in df_clean.columns:
-                df_clean.rename(columns={possible_name: standard_name}, inplace=True)
-                mapped_count += 1
-                st.sidebar.info(f"📝 Mapped '{possible_name}' → '{standard_name}'")
-                break
+    df_clean, debug_info['mapped'] = rename_aliases(df_clean, PAYMENT_COLUMN_MAPPING)
     
     # Ensure required columns exist
     required_cols = ['order_amount', 'final_amount', 'payment_received']
     for col in required_cols:
         if col not in df_clean.columns:
             df_clean[col] = 0.0
-            st.sidebar.warning(f"⚠️ Column '{col}' not found, using defaults")
+            log.append(("warning", f"⚠️ Column '{col}' not found, using defaults"))
     
     # Handle pending_amount separately
-    if 'pending_amount' not in df_clean.columns:
-        st.sidebar.info("🔄 'pending_amount' column not found, will calculate it")
+    debug_info['pending_missing'] = 'pending_amount' not in df_clean.columns
+    if debug_info['pending_missing']:
         df_clean['pending_amount'] = 0.0
     
     # Enhanced numeric conversion with debugging
@@ -394,7 +518,7 @@ def process_raw_data(df):
             original_samples = df_clean[col].head(3).tolist()
             
             # Apply conversion
-            df_clean[col] = df_clean[col].apply(safe_num)
+            df_clean[col] = vec_safe_num(df_clean[col])
             
             # Store converted samples
             converted_samples = df_clean[col].head(3).tolist()
@@ -404,137 +528,143 @@ def process_raw_data(df):
                 'total': df_clean[col].sum()
             }
     
-    # Show conversion debug
-    with st.sidebar.expander("💰 Number Conversion Debug"):
-        for col, debug_info in conversion_debug.items():
-            st.write(f"**{col}:**")
-            st.write(f"  Original: {debug_info['original']}")
-            st.write(f"  Converted: {debug_info['converted']}")
-            st.write(f"  Total: ₹ {debug_info['total']:,.2f}")
+    debug_info['conversion'] = conversion_debug
+    debug_info['pending_check'] = None
     
     # Calculate pending amount (CRITICAL FIX)
     if all(col in df_clean.columns for col in ['final_amount', 'payment_received']):
-        calculated_pending = df_clean['final_amount'] - df_clean['payment_received']
+        # Work on the raw arrays: one subtract and one maximum, no pandas dispatch
+        final = df_clean['final_amount'].to_numpy()
+        received = df_clean['payment_received'].to_numpy()
+        calculated_pending = final - received
         
         # Always use calculated pending for accuracy
-        df_clean['pending_amount'] = calculated_pending.clip(lower=0)
-        
-        # Show validation
-        existing_total = conversion_debug.get('pending_amount', {}).get('total', 0)
-        calculated_total = calculated_pending.sum()
+        df_clean['pending_amount'] = np.maximum(calculated_pending, 0.0)
         
-        st.sidebar.info(f"💰 Pending Amount Validation:")
-        st.sidebar.info(f"   CSV Provided: ₹ {existing_total:,.2f}")
-        st.sidebar.info(f"   Calculated: ₹ {calculated_total:,.2f}")
-        
-        if abs(existing_total - calculated_total) > 100:
-            st.sidebar.success("✅ Using calculated pending amounts for accuracy")
+        # Keep both totals for the validation shown in debug mode
+        debug_info['pending_check'] = (
+            conversion_debug.get('pending_amount', {}).get('total', 0),
+            calculated_pending.sum()
+        )
     
     # Process work status
     if 'work_status' not in df_clean.columns:
         df_clean['work_status'] = 'Unknown'
     else:
-        df_clean['work_status'] = df_clean['work_status'].fillna('Unknown').astype(str).str.strip().str.title()
+        df_clean['work_status'] = norm_text(df_clean['work_status'])
     
     # Process payment mode
     if 'payment_mode' not in df_clean.columns:
         df_clean['payment_mode'] = 'Unknown'
     else:
-        df_clean['payment_mode'] = df_clean['payment_mode'].fillna('Unknown').astype(str).str.strip().str.title()
+        df_clean['payment_mode'] = norm_text(df_clean['payment_mode'])
     
     # Process dates
     date_cols = ['date', 'p_date', 'payment_date']
     for date_col in date_cols:
         if date_col in df_clean.columns:
-            df_clean['payment_date'] = df_clean[date_col].apply(parse_date)
+            df_clean['payment_date'] = parse_dates(df_clean[date_col])
             break
     else:
         df_clean['payment_date'] = pd.NaT
     
-    df_clean['year'] = df_clean['payment_date'].dt.year.fillna(datetime.now().year).astype(int)
+    df_clean['year'] = df_clean['payment_date'].dt.year.fillna(datetime.now().year).astype('int16')
     
-    # Final summary
-    st.sidebar.success(f"✅ Processed {len(df_clean)} records")
-    st.sidebar.info(f"📊 Final Totals:")
-    st.sidebar.info(f"   Order: ₹ {df_clean['order_amount'].sum():,.2f}")
-    st.sidebar.info(f"   Final: ₹ {df_clean['final_amount'].sum():,.2f}")
-    st.sidebar.info(f"   Received: ₹ {df_clean['payment_received'].sum():,.2f}")
-    st.sidebar.info(f"   Pending: ₹ {df_clean['pending_amount'].sum():,.2f}")
+    # Low-cardinality labels as categoricals so counts/groupbys work on integer codes
+    for col in ['work_status', 'payment_mode', 'unit_name']:
+        if col in df_clean.columns:
+            df_clean[col] = df_clean[col].astype('category')
+    
+    df_clean = to_arrow_strings(df_clean, ['work_order_no'])
+    
+    return df_clean, debug_info
+
+def render_payment_debug(df, debug_info):
+    """Sidebar debug output for the payment processing step"""
+    with st.sidebar.expander("🔍 Payment Debug Info"):
+        st.write("Original columns:", debug_info['original_columns'])
+        st.write("Cleaned columns:", debug_info['cleaned_columns'])
+        st.write("Data shape:", debug_info['shape'])
+        if not debug_info['sample'].empty:
+            st.write("First 2 rows sample:")
+            st.dataframe(debug_info['sample'])
+    
+    if debug_info['mapped']:
+        st.sidebar.code("\n".join(f"{alias} → {standard}" for alias, standard in debug_info['mapped'].items()))
+    
+    if debug_info['pending_missing']:
+        st.sidebar.info("🔄 'pending_amount' column not found, will calculate it")
+    
+    with st.sidebar.expander("💰 Number Conversion Debug"):
+        for col, conversion in debug_info['conversion'].items():
+            st.write(f"**{col}:**")
+            st.write(f"  Original: {conversion['original']}")
+            st.write(f"  Converted: {conversion['converted']}")
+            st.write(f"  Total: ₹ {conversion['total']:,.2f}")
+    
+    if debug_info['pending_check'] is not None:
+        existing_total, calculated_total = debug_info['pending_check']
+        
+        st.sidebar.info(
+            f"💰 Pending Amount Validation:  \n"
+            f"   CSV Provided: ₹ {existing_total:,.2f}  \n"
+            f"   Calculated: ₹ {calculated_total:,.2f}"
+        )
+        
+        if abs(existing_total - calculated_total) > 100:
+            st.sidebar.success("✅ Using calculated pending amounts for accuracy")
     
-    return df_clean
+    # Final summary
+    st.sidebar.success(f"✅ Processed {len(df)} records")
+    st.sidebar.info(
+        f"📊 Final Totals:  \n"
+        f"   Order: ₹ {df['order_amount'].sum():,.2f}  \n"
+        f"   Final: ₹ {df['final_amount'].sum():,.2f}  \n"
+        f"   Received: ₹ {df['payment_received'].sum():,.2f}  \n"
+        f"   Pending: ₹ {df['pending_amount'].sum():,.2f}"
+    )
 
-def process_proposal_data(proposal_df):
+def process_proposal_data(proposal_df, log):
     """Process and clean proposal data based on your sheet structure"""
     if proposal_df.empty:
-        return proposal_df
+        return proposal_df, None
     
     df_clean = proposal_df.copy()
     
     # Clean column names
-    df_clean.columns = [clean_colname(c) for c in df_clean.columns]
-    
-    # Show debug info in main area for better visibility
-    st.sidebar.subheader("📋 Proposal Data Processing")
-    with st.sidebar.expander("🔍 Proposal Debug Info", expanded=True):
-        st.write("**Raw columns found:**", list(proposal_df.columns))
-        st.write("**Cleaned columns:**", list(df_clean.columns))
-        st.write("**Data shape:**", df_clean.shape)
-        if not df_clean.empty:
-            st.write("**First 3 rows:**")
-            st.dataframe(df_clean.head(3))
-            st.write("**Column types:**")
-            st.write(df_clean.dtypes)
-    
-    # Enhanced column mapping for proposals
-    column_mapping = {
-        's_no': ['s_no', 'sno', 'sl_no', 'serial_no', 'serial_number'],
-        'year': ['year', 'yr', 'year_'],
-        'date': ['date', 'proposal_date', 'submission_date'],
-        'wo_date': ['wo_date', 'work_order_date', 'order_date'],
-        'no': ['no', 'wo_no', 'work_order_no', 'order_no'],
-        'name': ['name', 'client_name', 'company', 'customer', 'client'],
-        'industry_type': ['industry_type', 'industry', 'business_type', 'sector'],
-        'district': ['district', 'location', 'city_district', 'area'],
-        'scope_of_work': ['scope_of_work', 'scope', 'work_scope', 'description'],
-        'type': ['type', 'proposal_type', 'category'],
-        'source': ['source', 'lead_source', 'referral_source'],
-        'status': ['status', 'proposal_status', 'current_status'],
-        'refrence_no': ['refrence_no', 'reference_no', 'ref_no', 'proposal_no'],
-        'contact_person': ['contact_person', 'contact', 'person', 'representative'],
-        'amount': ['amount', 'proposal_amount', 'value', 'quoted_amount'],
-        'present_status': ['present_status', 'current_status', 'latest_status', 'status_update']
+    df_clean.columns = clean_colnames(df_clean.columns)
+    
+    # Debug details are collected here and drawn by render_proposal_debug outside the cache
+    debug_info = {
+        'raw_columns': list(proposal_df.columns),
+        'cleaned_columns': list(df_clean.columns),
+        'shape': df_clean.shape,
+        'sample': df_clean.head(3),
+        'dtypes': df_clean.dtypes,
     }
     
     # Apply column mapping with feedback
-    mapped_count = 0
-    for standard_name, possible_names in column_mapping.items():
-        for possible_name in possible_names:
-            if possible_name in df_clean.columns and standard_name not in df_clean.columns:
-                df_clean.rename(columns={possible_name: standard_name}, inplace=True)
-                mapped_count += 1
-                st.sidebar.info(f"📝 Mapped '{possible_name}' → '{standard_name}'")
-                break
+    df_clean, debug_info['mapped'] = rename_aliases(df_clean, PROPOSAL_COLUMN_MAPPING)
     
     # Process amount column
-    if 'amount' in df_clean.columns:
-        st.sidebar.info(f"💰 Processing amount column...")
-        df_clean['amount'] = df_clean['amount'].apply(safe_num)
-        st.sidebar.success(f"✅ Total proposal value: ₹ {df_clean['amount'].sum():,.2f}")
+    debug_info['amount_found'] = 'amount' in df_clean.columns
+    if debug_info['amount_found']:
+        df_clean['amount'] = vec_safe_num(df_clean['amount'])
     else:
-        st.sidebar.warning("⚠️ Amount column not found in proposal data")
+        log.append(("warning", "⚠️ Amount column not found in proposal data"))
         df_clean['amount'] = 0.0
     
     # Process dates
     date_columns = ['date', 'wo_date']
     for date_col in date_columns:
         if date_col in df_clean.columns:
-            st.sidebar.info(f"📅 Processing {date_col} column...")
-            df_clean[date_col] = df_clean[date_col].apply(parse_date)
+            df_clean[date_col] = parse_dates(df_clean[date_col])
     
     # Process year (convert to integer if possible)
     if 'year' in df_clean.columns:
         try:
-            df_clean['year'] = pd.to_numeric(df_clean['year'], errors='coerce').fillna(0).astype(int)
+            year = pd.to_numeric(df_clean['year'], errors='coerce').fillna(0).astype(int)
+            df_clean['year'] = pd.to_numeric(year, downcast='integer')
         except:
             pass
     
@@ -542,22 +672,54 @@ def process_proposal_data(proposal_df):
     status_columns = ['status', 'present_status']
     for status_col in status_columns:
         if status_col in df_clean.columns:
-            df_clean[status_col] = df_clean[status_col].fillna('Unknown').astype(str).str.strip().str.title()
+            df_clean[status_col] = norm_text(df_clean[status_col])
     
     # Clean other text columns
     text_columns = ['name', 'industry_type', 'district', 'scope_of_work', 'type', 'source', 'refrence_no', 'contact_person']
     for col in text_columns:
         if col in df_clean.columns:
-            df_clean[col] = df_clean[col].fillna('').astype(str).str.strip()
+            df_clean[col] = norm_text(df_clean[col], fill='', title=False)
     
-    # Final summary
-    st.sidebar.success(f"✅ Processed {len(df_clean)} proposal records")
+    # Short client name (first part before comma) for the Top Clients chart
+    if 'name' in df_clean.columns:
+        df_clean['client_short'] = df_clean['name'].str.split(',', n=1).str[0].str.strip()
+    
+    # Low-cardinality labels as categoricals so counts/groupbys work on integer codes
+    category_columns = ['status', 'present_status', 'name', 'industry_type', 'district', 'type', 'source']
+    for col in category_columns:
+        if col in df_clean.columns:
+            df_clean[col] = df_clean[col].astype('category')
     
-    return df_clean
+    df_clean = to_arrow_strings(df_clean, ['scope_of_work', 'refrence_no', 'contact_person', 'client_short'])
+    
+    return df_clean, debug_info
+
+def render_proposal_debug(proposal_df, debug_info):
+    """Sidebar debug output for the proposal processing step"""
+    st.sidebar.subheader("📋 Proposal Data Processing")
+    with st.sidebar.expander("🔍 Proposal Debug Info", expanded=True):
+        st.write("**Raw columns found:**", debug_info['raw_columns'])
+        st.write("**Cleaned columns:**", debug_info['cleaned_columns'])
+        st.write("**Data shape:**", debug_info['shape'])
+        st.write("**First 3 rows:**")
+        st.dataframe(debug_info['sample'])
+        st.write("**Column types:**")
+        st.write(debug_info['dtypes'])
+    
+    if debug_info['mapped']:
+        st.sidebar.code("\n".join(f"{alias} → {standard}" for alias, standard in debug_info['mapped'].items()))
+    
+    if debug_info['amount_found']:
+        st.sidebar.success(f"✅ Total proposal value: ₹ {proposal_df['amount'].sum():,.2f}")
+    st.sidebar.success(f"✅ Processed {len(proposal_df)} proposal records")
 
 # ===================== PROPOSAL ANALYTICS FUNCTIONS =====================
-def get_proposal_insights(proposal_df):
+# Keyed on the load timestamp, so a rerun over the same frame reuses the results
+# without hashing it; the frame itself is an underscore argument Streamlit skips.
+@st.cache_data(ttl=120, show_spinner=False)
+def get_proposal_insights(loaded_at, _proposal_df):
     """Generate insights from proposal data"""
+    proposal_df = _proposal_df
     insights = {}
     
     if proposal_df.empty:
@@ -570,10 +732,17 @@ def get_proposal_insights(proposal_df):
     if 'amount' in proposal_df.columns:
         insights['total_value'] = proposal_df['amount'].sum()
     
-    # Status distribution
+    # Status distribution, OK and Drop counts in one pass over the category codes
     if 'status' in proposal_df.columns:
-        status_counts = proposal_df['status'].value_counts()
+        status = proposal_df['status'].astype('category')
+        codes = status.cat.codes.to_numpy()
+        counts = np.bincount(codes[codes >= 0], minlength=len(status.cat.categories))
+        status_counts = pd.Series(counts, index=status.cat.categories).sort_values(ascending=False)
         insights['status_distribution'] = status_counts.to_dict()
+        
+        upper_categories = status.cat.categories.str.upper()
+        insights['ok_count'] = int(counts[upper_categories == 'OK'].sum())
+        insights['drop_count'] = int(counts[upper_categories == 'DROP'].sum())
     
     # Present status distribution
     if 'present_status' in proposal_df.columns:
@@ -602,11 +771,192 @@ def get_proposal_insights(proposal_df):
     
     # Calculate conversion rate (OK vs Total)
     if 'status' in proposal_df.columns:
-        ok_count = len(proposal_df[proposal_df['status'].str.upper() == 'OK'])
-        insights['conversion_rate'] = (ok_count / len(proposal_df)) * 100 if len(proposal_df) > 0 else 0
+        insights['conversion_rate'] = (insights['ok_count'] / len(proposal_df)) * 100
     
     return insights
 
+@st.cache_data(ttl=120, show_spinner=False)
+def aggregate_proposals(loaded_at, _proposal_df):
+    """All count/value aggregations behind the proposal charts and summaries"""
+    proposal_df = _proposal_df
+    aggregates = {}
+    columns = proposal_df.columns
+    
+    for col in ('status', 'present_status', 'industry_type', 'source'):
+        if col in columns:
+            aggregates[f'{col}_counts'] = proposal_df[col].value_counts()
+    
+    if 'amount' in columns and 'status' in columns:
+        value_by_status = proposal_df.groupby('status', observed=True, sort=False)['amount'].sum()
+        aggregates['value_by_status'] = value_by_status.sort_values(ascending=False)
+    
+    if 'amount' in columns and 'client_short' in columns:
+        top_clients = proposal_df.groupby('client_short', sort=False)['amount'].sum()
+        aggregates['top_clients'] = top_clients.sort_values(ascending=False).head(10)
+    
+    return aggregates
+
+# ===================== KPI CARDS =====================
+def metric_card(title, value):
+    """HTML for a single KPI card"""
+    return (
+        f'<div class="metric-card">'
+        f'<div class="metric-title">{title}</div>'
+        f'<div class="metric-value">{value}</div>'
+        f'</div>'
+    )
+
+def render_kpi_row(cards):
+    """Render a row of (title, value) KPI cards with one st.markdown call"""
+    html = ''.join(metric_card(title, value) for title, value in cards)
+    st.markdown(f'<div class="kpi-row">{html}</div>', unsafe_allow_html=True)
+
+# ===================== CHART BUILDERS =====================
+# Builders take plain tuples so st.cache_data can key on them cheaply; a rerun
+# with unchanged counts reuses the cached Figure instead of rebuilding it.
+CHART_LAYOUT = dict(paper_bgcolor='rgba(0,0,0,0)', plot_bgcolor='rgba(0,0,0,0)', font_color="white")
+
+# Above this many bars, per-bar text labels move to hover only
+BAR_LABEL_LIMIT = 20
+
+# Color mapping for specific status values
+STATUS_COLORS = {
+    'OK': '#10B981',
+    'Drop': '#F59E0B',  # Changed from #EF4444 to #F59E0B for Follow-up
+    'Pending': '#F59E0B',
+    'Approved': '#10B981',
+    'Rejected': '#EF4444',
+    'Under Review': '#8B5CF6',
+    'Ongoing': '#3B82F6',
+    'Others': '#6B7280',
+    'Follow-up': '#F59E0B'  # Added Follow-up color
+}
+
+PRESENT_STATUS_COLORS = {
+    'Ongoing': '#3B82F6',
+    'Others': '#6B7280',
+    'Approved': '#10B981',
+    'Pending': '#F59E0B',
+    'Completed': '#10B981',
+    'Rejected': '#EF4444',
+    'Follow-up': '#F59E0B'  # Added Follow-up color
+}
+
+VALUE_STATUS_COLORS = {
+    'OK': '#10B981',
+    'Drop': '#F59E0B',  # Changed from #EF4444 to #F59E0B for Follow-up
+    'Pending': '#F59E0B',
+    'Approved': '#10B981',
+    'Follow-up': '#F59E0B'  # Added Follow-up color
+}
+
+# CSS classes for the status breakdowns: exact (upper-cased) label first,
+# then the first keyword contained in the lower-cased label
+STATUS_CLASS = {
+    'OK': 'status-ok',
+    'DROP': 'status-followup',  # Changed from "status-drop" to "status-followup"
+}
+
+STATUS_CLASS_KEYWORDS = (
+    ('pending', 'status-pending'),
+    ('ongoing', 'status-ongoing'),
+    ('follow', 'status-followup'),
+)
+
+PRESENT_STATUS_CLASS_KEYWORDS = (
+    ('ongoing', 'status-ongoing'),
+    ('approved', 'status-approved'),
+    ('pending', 'status-pending'),
+    ('rejected', 'status-rejected'),
+    ('follow', 'status-followup'),
+)
+
+def status_css_class(label, exact, keywords):
+    """CSS class for a status label, falling back to status-others"""
+    css_class = exact.get(label.upper())
+    if css_class:
+        return css_class
+    lowered = label.lower()
+    for keyword, css_class in keywords:
+        if keyword in lowered:
+            return css_class
+    return "status-others"
+
+@st.cache_data(ttl=3600, show_spinner=False)
+def make_donut(names, values, label, value_label='Count', color_map=None, colors=None,
+               hole=0.4, top_legend=True):
+    """Donut chart of value per name; every pie on both tabs goes through here"""
+    data = pd.DataFrame({label: names, value_label: values})
+    if color_map:
+        fig = px.pie(data, names=label, values=value_label, hole=hole,
+                     color=label, color_discrete_map=color_map)
+    else:
+        fig = px.pie(data, names=label, values=value_label, hole=hole,
+                     color_discrete_sequence=list(colors) if colors else None)
+    
+    layout = dict(CHART_LAYOUT, showlegend=True, height=400)
+    if top_legend:
+        layout['legend'] = dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1)
+    fig.update_layout(**layout)
+    fig.update_traces(textposition='inside', textinfo='percent+label')
+    return fig
+
+@st.cache_data(ttl=3600, show_spinner=False)
+def make_value_by_status_bar(statuses, amounts):
+    """Bar chart of total proposal value per status"""
+    data = pd.DataFrame({'status': statuses, 'amount': amounts})
+    fig = px.bar(data, x='status', y='amount',
+                 labels={'amount': 'Total Value (₹)', 'status': 'Status'},
+                 color='status',
+                 color_discrete_map=VALUE_STATUS_COLORS)
+    fig.update_layout(
+        **CHART_LAYOUT,
+        xaxis_title="Status",
+        yaxis_title="Total Value (₹)",
+        showlegend=False
+    )
+    fig.update_traces(texttemplate='₹%{y:,.2f}', textposition='outside')
+    return fig
+
+@st.cache_data(ttl=3600, show_spinner=False)
+def make_top_clients_bar(clients, amounts):
+    """Horizontal bar chart of the top clients by proposal value"""
+    data = pd.DataFrame({'client_short': clients, 'amount': amounts})
+    fig = px.bar(data, x='amount', y='client_short', orientation='h',
+                 labels={'amount': 'Total Value (₹)', 'client_short': 'Client'},
+                 color='amount',
+                 color_continuous_scale='Viridis')
+    fig.update_layout(
+        **CHART_LAYOUT,
+        xaxis_title="Total Value (₹)",
+        yaxis_title="Client",
+        showlegend=False,
+        uirevision='clients'
+    )
+    fig.update_traces(texttemplate='₹%{x:,.2f}', textposition='outside')
+    return fig
+
+@st.cache_data(ttl=3600, show_spinner=False)
+def make_source_bar(sources, counts):
+    """Bar chart of proposal count per source"""
+    data = pd.DataFrame({'Source': sources, 'Count': counts})
+    fig = px.bar(data, x='Source', y='Count',
+                 labels={'Count': 'Number of Proposals', 'Source': 'Source'},
+                 color='Count',
+                 color_continuous_scale='Blues')
+    fig.update_layout(
+        **CHART_LAYOUT,
+        xaxis_title="Source",
+        yaxis_title="Number of Proposals",
+        showlegend=False,
+        uirevision='sources'
+    )
+    if len(sources) > BAR_LABEL_LIMIT:
+        fig.update_traces(hovertemplate='%{x}: %{y}<extra></extra>')
+    else:
+        fig.update_traces(texttemplate='%{y}', textposition='outside')
+    return fig
+
 # ===================== PROPOSAL DASHBOARD (Structured like Payment Dashboard) =====================
 def display_proposal_dashboard(proposal_df):
     """Display proposal dashboard structured like payment dashboard"""
@@ -624,64 +974,33 @@ def display_proposal_dashboard(proposal_df):
         return
     
     # Get insights
-    insights = get_proposal_insights(proposal_df)
+    loaded_at = proposal_df.attrs.get('loaded_at')
+    insights = get_proposal_insights(loaded_at, proposal_df)
+    aggregates = aggregate_proposals(loaded_at, proposal_df)
     
     # ===================== PROPOSAL KPIs =====================
     total_proposals = insights.get('total_proposals', 0)
     total_value = insights.get('total_value', 0)
     
-    # Calculate approved/OK count
-    approved_count = 0
-    if 'status' in proposal_df.columns:
-        approved_count = len(proposal_df[proposal_df['status'].str.upper() == 'OK'])
+    # Approved/OK count
+    approved_count = insights.get('ok_count', 0)
     
-    # Calculate Follow-up count (changed from dropped/rejected)
-    followup_count = 0
-    if 'status' in proposal_df.columns:
-        # Count Drop status as Follow-up
-        followup_count = len(proposal_df[proposal_df['status'].str.upper() == 'DROP'])
+    # Follow-up count (changed from dropped/rejected): Drop status counts as Follow-up
+    followup_count = insights.get('drop_count', 0)
     
     # Calculate conversion rate
     conversion_rate = insights.get('conversion_rate', 0)
     
     st.markdown('<div class="section-header">📊 Proposal Overview</div>', unsafe_allow_html=True)
     
-    st.markdown('<div class="kpi-row">', unsafe_allow_html=True)
-    col1, col2, col3, col4 = st.columns(4)
-    
-    with col1:
-        st.markdown(f"""
-            <div class="metric-card">
-                <div class="metric-title">Total Proposals</div>
-                <div class="metric-value">{total_proposals}</div>
-            </div>
-        """, unsafe_allow_html=True)
-    
-    with col2:
-        st.markdown(f"""
-            <div class="metric-card">
-                <div class="metric-title">Total Value</div>
-                <div class="metric-value">₹ {total_value:,.2f}</div>
-            </div>
-        """, unsafe_allow_html=True)
-    
-    with col3:
-        st.markdown(f"""
-            <div class="metric-card">
-                <div class="metric-title">Approved/OK</div>
-                <div class="metric-value">{approved_count}</div>
-            </div>
-        """, unsafe_allow_html=True)
-    
-    with col4:
+    # All four cards go out in a single markdown element
+    render_kpi_row([
+        ("Total Proposals", f"{total_proposals}"),
+        ("Total Value", f"₹ {total_value:,.2f}"),
+        ("Approved/OK", f"{approved_count}"),
         # Changed from "Dropped/Rejected" to "Follow-up"
-        st.markdown(f"""
-            <div class="metric-card">
-                <div class="metric-title">Follow-up</div>
-                <div class="metric-value">{followup_count}</div>
-            </div>
-        """, unsafe_allow_html=True)
-    st.markdown('</div>', unsafe_allow_html=True)
+        ("Follow-up", f"{followup_count}"),
+    ])
     
     # ===================== PIE CHARTS SECTION =====================
     st.markdown('<div class="section-header">📈 Proposal Analytics</div>', unsafe_allow_html=True)
@@ -693,36 +1012,11 @@ def display_proposal_dashboard(proposal_df):
         st.markdown('<div class="chart-container">', unsafe_allow_html=True)
         st.markdown("**Proposal Status Distribution**")
         
-        if 'status' in proposal_df.columns and not proposal_df['status'].empty:
-            status_counts = proposal_df['status'].value_counts().reset_index()
-            status_counts.columns = ['Status', 'Count']
-            
-            # Define color mapping for specific status values
-            status_colors = {
-                'OK': '#10B981',
-                'Drop': '#F59E0B',  # Changed from #EF4444 to #F59E0B for Follow-up
-                'Pending': '#F59E0B',
-                'Approved': '#10B981',
-                'Rejected': '#EF4444',
-                'Under Review': '#8B5CF6',
-                'Ongoing': '#3B82F6',
-                'Others': '#6B7280',
-                'Follow-up': '#F59E0B'  # Added Follow-up color
-            }
-            
-            # Create pie chart
-            fig = px.pie(status_counts, names='Status', values='Count', hole=0.4,
-                        color='Status', color_discrete_map=status_colors)
-            fig.update_layout(
-                paper_bgcolor='rgba(0,0,0,0)',
-                plot_bgcolor='rgba(0,0,0,0)',
-                font_color="white",
-                showlegend=True,
-                legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1),
-                height=400
-            )
-            fig.update_traces(textposition='inside', textinfo='percent+label')
-            st.plotly_chart(fig, use_container_width=True)
+        if 'status_counts' in aggregates:
+            status_counts = aggregates['status_counts']
+            fig = make_donut(tuple(status_counts.index), tuple(status_counts.tolist()),
+                             'Status', color_map=STATUS_COLORS)
+            st.plotly_chart(fig, use_container_width=True, key="proposal_status_pie")
         else:
             st.info("Status data not available in proposal data")
         st.markdown('</div>', unsafe_allow_html=True)
@@ -732,34 +1026,11 @@ def display_proposal_dashboard(proposal_df):
         st.markdown('<div class="chart-container">', unsafe_allow_html=True)
         st.markdown("**Present Status Distribution**")
         
-        if 'present_status' in proposal_df.columns and not proposal_df['present_status'].empty:
-            present_status_counts = proposal_df['present_status'].value_counts().reset_index()
-            present_status_counts.columns = ['Present Status', 'Count']
-            
-            # Define color mapping
-            present_status_colors = {
-                'Ongoing': '#3B82F6',
-                'Others': '#6B7280',
-                'Approved': '#10B981',
-                'Pending': '#F59E0B',
-                'Completed': '#10B981',
-                'Rejected': '#EF4444',
-                'Follow-up': '#F59E0B'  # Added Follow-up color
-            }
-            
-            # Create pie chart
-            fig2 = px.pie(present_status_counts, names='Present Status', values='Count', hole=0.4,
-                         color='Present Status', color_discrete_map=present_status_colors)
-            fig2.update_layout(
-                paper_bgcolor='rgba(0,0,0,0)',
-                plot_bgcolor='rgba(0,0,0,0)',
-                font_color="white",
-                showlegend=True,
-                legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1),
-                height=400
-            )
-            fig2.update_traces(textposition='inside', textinfo='percent+label')
-            st.plotly_chart(fig2, use_container_width=True)
+        if 'present_status_counts' in aggregates:
+            present_status_counts = aggregates['present_status_counts']
+            fig2 = make_donut(tuple(present_status_counts.index), tuple(present_status_counts.tolist()),
+                              'Present Status', color_map=PRESENT_STATUS_COLORS)
+            st.plotly_chart(fig2, use_container_width=True, key="proposal_present_status_pie")
         else:
             st.info("Present Status data not available")
         st.markdown('</div>', unsafe_allow_html=True)
@@ -772,30 +1043,10 @@ def display_proposal_dashboard(proposal_df):
         st.markdown('<div class="chart-container">', unsafe_allow_html=True)
         st.markdown("**Total Value by Status**")
         
-        if 'amount' in proposal_df.columns and 'status' in proposal_df.columns:
-            value_by_status = proposal_df.groupby('status')['amount'].sum().reset_index()
-            value_by_status = value_by_status.sort_values('amount', ascending=False)
-            
-            fig3 = px.bar(value_by_status, x='status', y='amount',
-                         labels={'amount': 'Total Value (₹)', 'status': 'Status'},
-                         color='status',
-                         color_discrete_map={
-                             'OK': '#10B981',
-                             'Drop': '#F59E0B',  # Changed from #EF4444 to #F59E0B for Follow-up
-                             'Pending': '#F59E0B',
-                             'Approved': '#10B981',
-                             'Follow-up': '#F59E0B'  # Added Follow-up color
-                         })
-            fig3.update_layout(
-                paper_bgcolor='rgba(0,0,0,0)',
-                plot_bgcolor='rgba(0,0,0,0)',
-                font_color="white",
-                xaxis_title="Status",
-                yaxis_title="Total Value (₹)",
-                showlegend=False
-            )
-            fig3.update_traces(texttemplate='₹%{y:,.2f}', textposition='outside')
-            st.plotly_chart(fig3, use_container_width=True)
+        if 'value_by_status' in aggregates:
+            value_by_status = aggregates['value_by_status']
+            fig3 = make_value_by_status_bar(tuple(value_by_status.index), tuple(value_by_status.tolist()))
+            st.plotly_chart(fig3, use_container_width=True, key="proposal_value_by_status")
         else:
             st.info("Amount or Status data not available for value analysis")
         st.markdown('</div>', unsafe_allow_html=True)
@@ -805,29 +1056,10 @@ def display_proposal_dashboard(proposal_df):
         st.markdown('<div class="chart-container">', unsafe_allow_html=True)
         st.markdown("**Top Clients by Proposal Value**")
         
-        if 'amount' in proposal_df.columns and 'name' in proposal_df.columns:
-            # Extract client names (take first part before comma)
-            proposal_df['client_short'] = proposal_df['name'].apply(
-                lambda x: str(x).split(',')[0].strip() if pd.notnull(x) else 'Unknown'
-            )
-            
-            top_clients = proposal_df.groupby('client_short')['amount'].sum().reset_index()
-            top_clients = top_clients.sort_values('amount', ascending=False).head(10)
-            
-            fig4 = px.bar(top_clients, x='amount', y='client_short', orientation='h',
-                         labels={'amount': 'Total Value (₹)', 'client_short': 'Client'},
-                         color='amount',
-                         color_continuous_scale='Viridis')
-            fig4.update_layout(
-                paper_bgcolor='rgba(0,0,0,0)',
-                plot_bgcolor='rgba(0,0,0,0)',
-                font_color="white",
-                xaxis_title="Total Value (₹)",
-                yaxis_title="Client",
-                showlegend=False
-            )
-            fig4.update_traces(texttemplate='₹%{x:,.2f}', textposition='outside')
-            st.plotly_chart(fig4, use_container_width=True)
+        if 'top_clients' in aggregates:
+            top_clients = aggregates['top_clients']
+            fig4 = make_top_clients_bar(tuple(top_clients.index), tuple(top_clients.tolist()))
+            st.plotly_chart(fig4, use_container_width=True, key="proposal_top_clients")
         else:
             st.info("Amount or Name data not available for client analysis")
         st.markdown('</div>', unsafe_allow_html=True)
@@ -841,34 +1073,21 @@ def display_proposal_dashboard(proposal_df):
         st.markdown('<div class="status-summary">', unsafe_allow_html=True)
         st.markdown("**Proposal Status Breakdown**")
         
-        if 'status' in proposal_df.columns:
-            status_summary = proposal_df['status'].value_counts().reset_index()
+        if 'status_counts' in aggregates:
+            status_summary = aggregates['status_counts'].reset_index()
             status_summary.columns = ['Status', 'Count']
             
-            for _, row in status_summary.iterrows():
-                status = row['Status']
-                count = row['Count']
-                
-                # Determine CSS class based on status
-                if status.upper() == 'OK':
-                    status_class = "status-ok"
-                elif status.upper() == 'DROP':
-                    status_class = "status-followup"  # Changed from "status-drop" to "status-followup"
-                elif 'pending' in status.lower():
-                    status_class = "status-pending"
-                elif 'ongoing' in status.lower():
-                    status_class = "status-ongoing"
-                elif 'follow' in status.lower():
-                    status_class = "status-followup"
-                else:
-                    status_class = "status-others"
-                
-                st.markdown(f"""
-                    <div class="status-item">
-                        <span class="{status_class}">{status}</span>
-                        <span>{count}</span>
-                    </div>
-                """, unsafe_allow_html=True)
+            # Build every row first and send the list as a single markdown element
+            items = []
+            for status, count in status_summary.itertuples(index=False):
+                status_class = status_css_class(status, STATUS_CLASS, STATUS_CLASS_KEYWORDS)
+                items.append(
+                    f'<div class="status-item">'
+                    f'<span class="{status_class}">{status}</span>'
+                    f'<span>{count}</span>'
+                    f'</div>'
+                )
+            st.markdown(''.join(items), unsafe_allow_html=True)
         else:
             st.info("No status data available in proposal data")
         st.markdown('</div>', unsafe_allow_html=True)
@@ -877,34 +1096,20 @@ def display_proposal_dashboard(proposal_df):
         st.markdown('<div class="status-summary">', unsafe_allow_html=True)
         st.markdown("**Present Status Breakdown**")
         
-        if 'present_status' in proposal_df.columns:
-            present_status_summary = proposal_df['present_status'].value_counts().reset_index()
+        if 'present_status_counts' in aggregates:
+            present_status_summary = aggregates['present_status_counts'].reset_index()
             present_status_summary.columns = ['Present Status', 'Count']
             
-            for _, row in present_status_summary.iterrows():
-                present_status = row['Present Status']
-                count = row['Count']
-                
-                # Determine CSS class based on present status
-                if 'ongoing' in present_status.lower():
-                    status_class = "status-ongoing"
-                elif 'approved' in present_status.lower():
-                    status_class = "status-approved"
-                elif 'pending' in present_status.lower():
-                    status_class = "status-pending"
-                elif 'rejected' in present_status.lower():
-                    status_class = "status-rejected"
-                elif 'follow' in present_status.lower():
-                    status_class = "status-followup"
-                else:
-                    status_class = "status-others"
-                
-                st.markdown(f"""
-                    <div class="status-item">
-                        <span class="{status_class}">{present_status}</span>
-                        <span>{count}</span>
-                    </div>
-                """, unsafe_allow_html=True)
+            items = []
+            for present_status, count in present_status_summary.itertuples(index=False):
+                status_class = status_css_class(present_status, {}, PRESENT_STATUS_CLASS_KEYWORDS)
+                items.append(
+                    f'<div class="status-item">'
+                    f'<span class="{status_class}">{present_status}</span>'
+                    f'<span>{count}</span>'
+                    f'</div>'
+                )
+            st.markdown(''.join(items), unsafe_allow_html=True)
         else:
             st.info("No present status data available")
         st.markdown('</div>', unsafe_allow_html=True)
@@ -918,20 +1123,11 @@ def display_proposal_dashboard(proposal_df):
         st.markdown('<div class="chart-container">', unsafe_allow_html=True)
         st.markdown("**Industry Type Distribution**")
         
-        if 'industry_type' in proposal_df.columns and not proposal_df['industry_type'].empty:
-            industry_counts = proposal_df['industry_type'].value_counts().reset_index()
-            industry_counts.columns = ['Industry Type', 'Count']
-            
-            fig5 = px.pie(industry_counts, names='Industry Type', values='Count', hole=0.4)
-            fig5.update_layout(
-                paper_bgcolor='rgba(0,0,0,0)',
-                plot_bgcolor='rgba(0,0,0,0)',
-                font_color="white",
-                showlegend=True,
-                height=400
-            )
-            fig5.update_traces(textposition='inside', textinfo='percent+label')
-            st.plotly_chart(fig5, use_container_width=True)
+        if 'industry_type_counts' in aggregates:
+            industry_counts = aggregates['industry_type_counts']
+            fig5 = make_donut(tuple(industry_counts.index), tuple(industry_counts.tolist()),
+                              'Industry Type', top_legend=False)
+            st.plotly_chart(fig5, use_container_width=True, key="proposal_industry_pie")
         else:
             st.info("Industry Type data not available")
         st.markdown('</div>', unsafe_allow_html=True)
@@ -940,98 +1136,554 @@ def display_proposal_dashboard(proposal_df):
         st.markdown('<div class="chart-container">', unsafe_allow_html=True)
         st.markdown("**Source Distribution**")
         
-        if 'source' in proposal_df.columns and not proposal_df['source'].empty:
-            source_counts = proposal_df['source'].value_counts().reset_index()
-            source_counts.columns = ['Source', 'Count']
-            
-            fig6 = px.bar(source_counts, x='Source', y='Count',
-                         labels={'Count': 'Number of Proposals', 'Source': 'Source'},
-                         color='Count',
-                         color_continuous_scale='Blues')
-            fig6.update_layout(
-                paper_bgcolor='rgba(0,0,0,0)',
-                plot_bgcolor='rgba(0,0,0,0)',
-                font_color="white",
-                xaxis_title="Source",
-                yaxis_title="Number of Proposals",
-                showlegend=False
-            )
-            fig6.update_traces(texttemplate='%{y}', textposition='outside')
-            st.plotly_chart(fig6, use_container_width=True)
+        if 'source_counts' in aggregates:
+            source_counts = aggregates['source_counts']
+            fig6 = make_source_bar(tuple(source_counts.index), tuple(source_counts.tolist()))
+            st.plotly_chart(fig6, use_container_width=True, key="proposal_source_bar")
         else:
             st.info("Source data not available")
         st.markdown('</div>', unsafe_allow_html=True)
 
-# ===================== MAIN DATA LOADING LOGIC =====================
-def load_data():
-    st.sidebar.header("🔧 Data Configuration")
-    
-    # Display current configuration
-    st.sidebar.info(f"""
-    **Current Setup:**
-    - Spreadsheet: `{SPREADSHEET_ID}`
-    - Payment Sheet GID: `{SHEET_GID}`
-    - Proposal Sheet GID: `{PROPOSAL_GID}`
-    """)
-    
-    # Data source selection
-    data_source = st.sidebar.radio(
-        "Select Data Source:",
-        ["Service Account (Most Accurate)", "CSV Export", "Demo Data"],
-        index=0
+# ===================== PAYMENT AGGREGATIONS =====================
+PAYMENT_AMOUNT_COLUMNS = ["order_amount", "final_amount", "payment_received", "pending_amount"]
+
+@st.cache_data(ttl=120, show_spinner=False)
+def aggregate_payments(loaded_at, _df):
+    """KPI totals and every groupby behind the payment charts, keyed on the load stamp"""
+    df = _df
+    aggregates = {}
+    
+    # One reduction over the four float columns instead of four separate sums
+    aggregates['totals'] = tuple(df[PAYMENT_AMOUNT_COLUMNS].to_numpy(dtype='float64').sum(axis=0).tolist())
+    
+    if "payment_mode" in df.columns:
+        aggregates['by_mode'] = df.groupby("payment_mode", observed=True)["payment_received"].sum()
+    
+    aggregates['by_status'] = df.groupby("work_status", observed=True).agg(
+        count=("work_status", "count"),
+        actual_pending=("pending_amount", "sum"),
+        total_final=("final_amount", "sum"),
+        total_received=("payment_received", "sum")
     )
     
+    if 'year' in df.columns:
+        aggregates['by_year'] = df.groupby('year')[PAYMENT_AMOUNT_COLUMNS].sum().reset_index()
+    
+    return aggregates
+
+# ===================== FILTER OPTIONS =====================
+# Keyed on the frame's load stamp and shared as-is (options are immutable tuples),
+# so reruns neither hash the frame nor unpickle a fresh copy of the options
+def _select_options(col):
+    """'All' followed by the sorted distinct non-null values of a column"""
+    if isinstance(col.dtype, pd.CategoricalDtype):
+        values = col.cat.remove_unused_categories().cat.categories.to_numpy()
+    else:
+        values = col.dropna().to_numpy()
+    return ("All",) + tuple(np.unique(values).tolist())
+
+@st.cache_resource(ttl=120, show_spinner=False)
+def payment_filter_options(loaded_at, _df):
+    """Selectbox options and amount slider bounds for the payment filters"""
+    options = {}
+    for key, col in [('status', 'work_status'), ('mode', 'payment_mode'), ('unit', 'unit_name')]:
+        if col in _df.columns:
+            options[key] = _select_options(_df[col])
+    options['amount_range'] = (float(_df["final_amount"].min()), float(_df["final_amount"].max()))
+    return options
+
+@st.cache_resource(ttl=120, show_spinner=False)
+def proposal_filter_options(loaded_at, _proposal_df):
+    """Selectbox options and amount slider bounds for the proposal filters"""
+    options = {}
+    for key, col in [('status', 'status'), ('present_status', 'present_status'), ('client', 'name')]:
+        if col in _proposal_df.columns:
+            options[key] = _select_options(_proposal_df[col])
+    if 'amount' in _proposal_df.columns:
+        options['amount_range'] = (float(_proposal_df['amount'].min()), float(_proposal_df['amount'].max()))
+    return options
+
+# ===================== MAIN DATA LOADING LOGIC =====================
+# The processed frames below are shared via st.cache_resource (no per-rerun
+# pickle copy), so callers must treat them as read-only. The raw loaders above
+# are only called from these cached functions, so they need no cache of their own.
+class SheetUnavailable(Exception):
+    """No source returned data; raised (with the load messages) so the failed load is never cached"""
+
+def _load_raw_payment(data_source, log):
+    """Fetch raw payment data from the selected source, falling back to the other one"""
     df = None
     
     if data_source == "Service Account (Most Accurate)":
-        df = load_via_service()
+        df = load_via_service(log)
         if df is None:
-            st.sidebar.warning("🔄 Service Account failed, trying CSV...")
-            df = load_via_csv()
+            log.append(("warning", "🔄 Service Account failed, trying CSV..."))
+            df = load_via_csv(log)
             
     elif data_source == "CSV Export":
-        df = load_via_csv()
+        df = load_via_csv(log)
         if df is None:
-            st.sidebar.warning("🔄 CSV failed, trying Service Account...")
-            df = load_via_service()
+            log.append(("warning", "🔄 CSV failed, trying Service Account..."))
+            df = load_via_service(log)
         
     else:  # Demo Data
         df = load_demo_data()
-        st.sidebar.info("📋 Using Demo Data for display")
-    
-    # Final fallback to demo data
-    if df is None or df.empty:
-        st.error("❌ Could not load data from either source. Using demo data.")
-        df = load_demo_data()
-        st.warning("⚠️ Displaying DEMO DATA - Check your spreadsheet sharing settings")
+        log.append(("info", "📋 Using Demo Data for display"))
     
-    return process_raw_data(df)
+    return df
 
-def load_proposals():
-    """Load proposal data from Google Sheets"""
-    st.sidebar.subheader("📋 Proposal Data Loading")
-    
+@st.cache_resource(ttl=DATA_TTL, show_spinner=False, max_entries=4)
+def get_payment_df(data_source, version):
+    """Load and process payment data once per data version, with its debug details and messages"""
+    log = []
+    raw_df = _load_raw_payment(data_source, log)
+    if raw_df is None or raw_df.empty:
+        raise SheetUnavailable(log)
+    
+    df, debug_info = process_raw_data(raw_df, log)
+    # Load stamp identifies this version of the data in downstream cache keys
+    df.attrs['loaded_at'] = datetime.now().isoformat()
+    return df, debug_info, log
+
+@st.cache_resource(ttl=DATA_TTL, show_spinner=False, max_entries=4)
+def get_proposal_df(version):
+    """Load and process proposal data once per data version, with its debug details and messages"""
+    log = []
     # Try to load real proposal data via Service Account
-    proposal_df = load_proposal_data()
+    proposal_df = load_proposal_data(log)
     
     # If service account fails, try CSV export
     if proposal_df is None or proposal_df.empty:
-        st.sidebar.warning("🔄 Service Account failed for proposals, trying CSV export...")
-        proposal_df = load_proposal_via_csv()
+        log.append(("warning", "🔄 Service Account failed for proposals, trying CSV export..."))
+        proposal_df = load_proposal_via_csv(log)
     
-    # If still no data, show error
     if proposal_df is None or proposal_df.empty:
-        st.sidebar.error("❌ Failed to load proposal data from Google Sheets")
-        st.sidebar.info("""
+        raise SheetUnavailable(log)
+    
+    proposal_df, debug_info = process_proposal_data(proposal_df, log)
+    proposal_df.attrs['loaded_at'] = datetime.now().isoformat()
+    return proposal_df, debug_info, log
+
+# Loaders run in worker threads and only fetch and parse; what they have to say
+# comes back as (level, text) messages that the script thread draws afterwards.
+# Level "debug" marks per-worksheet/per-column listings shown only with Debug logs.
+@st.cache_resource(ttl=FALLBACK_REFRESH, show_spinner=False)
+def _recent_failure(key, version):
+    """Failure marker for one loader and data version; expires after FALLBACK_REFRESH"""
+    return {}
+
+@st.cache_resource(show_spinner=False)
+def _last_good(key):
+    """Most recent successful result of one loader, served while its source is failing"""
+    return {}
+
+def _load_guarded(key, version, loader, *args):
+    """Run a cached loader unless it failed recently; returns (result or last good, failure log)"""
+    failure = _recent_failure(key, version)
+    last_good = _last_good(key)
+    if 'log' not in failure:
+        try:
+            last_good['result'] = loader(*args)
+            return last_good['result'], None
+        except SheetUnavailable as e:
+            failure['log'] = e.args[0]
+    return last_good.get('result'), failure['log']
+
+def load_payment(data_source, version):
+    """Cached payment data, else the last good or demo data while every source is failing, plus main-area notices"""
+    result, failure_log = _load_guarded(("payment", data_source), version, get_payment_df, data_source, version)
+    if failure_log is None:
+        return result, []
+    
+    if result is not None:
+        df, debug_info, _ = result
+        notices = [("warning", "⚠️ Google Sheets is unreachable - showing the last data loaded successfully")]
+        return (df, debug_info, failure_log), notices
+    
+    # Final fallback to demo data until the failure marker expires
+    df, debug_info, log = get_payment_df("Demo Data", version)
+    notices = [
+        ("error", "❌ Could not load data from either source. Using demo data."),
+        ("warning", "⚠️ Displaying DEMO DATA - Check your spreadsheet sharing settings"),
+    ]
+    return (df, debug_info, failure_log + log), notices
+
+def load_proposals(version):
+    """Cached proposal data, else the last good data or an empty frame while every source is failing"""
+    result, failure_log = _load_guarded("proposal", version, get_proposal_df, version)
+    if failure_log is None:
+        return result
+    
+    if result is not None:
+        proposal_df, debug_info, _ = result
+        return proposal_df, debug_info, failure_log + [
+            ("warning", "⚠️ Showing the last proposal data loaded successfully"),
+        ]
+    
+    log = failure_log + [
+        ("error", "❌ Failed to load proposal data from Google Sheets"),
+        ("info", """
         **Possible solutions:**
         1. Check if the Google Sheet is shared with the service account
         2. Verify the Proposal GID is correct
         3. Check if the proposal sheet exists
         4. Ensure service account JSON file is correct
-        """)
-        return pd.DataFrame()  # Return empty dataframe
+        """),
+    ]
+    return pd.DataFrame(), None, log  # Return empty dataframe
+
+def render_messages(messages, area):
+    """Draw loader messages with the matching st call; "debug" ones only with Debug logs on"""
+    for level, text in messages:
+        if level == "debug":
+            if not DEBUG:
+                continue
+            level = "info"
+        getattr(area, level)(text)
+
+def _run_with_ctx(ctx, fn, *args):
+    """Run fn in a worker thread attached to the current script run"""
+    add_script_run_ctx(threading.current_thread(), ctx)
+    return fn(*args)
+
+def load_all():
+    """Render the loading controls, then fetch payment and proposal data concurrently"""
+    st.sidebar.header("🔧 Data Configuration")
+    
+    # Display current configuration
+    st.sidebar.info(f"""
+    **Current Setup:**
+    - Spreadsheet: `{SPREADSHEET_ID}`
+    - Payment Sheet GID: `{SHEET_GID}`
+    - Proposal Sheet GID: `{PROPOSAL_GID}`
+    """)
+    
+    # Data source selection
+    data_source = st.sidebar.radio(
+        "Select Data Source:",
+        ["Service Account (Most Accurate)", "CSV Export", "Demo Data"],
+        index=0
+    )
+    
+    # Reruns (auto refresh included) only refetch once the sheet has changed
+    version = data_version()
+    
+    # Both loaders are network-bound, so overlap the two sheet fetches
+    ctx = get_script_run_ctx()
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        payment_future = pool.submit(_run_with_ctx, ctx, load_payment, data_source, version)
+        proposal_future = pool.submit(_run_with_ctx, ctx, load_proposals, version)
+        (df, payment_debug, payment_log), payment_notices = payment_future.result()
+        proposal_df, proposal_debug, proposal_log = proposal_future.result()
+    
+    # Only this thread draws: worker threads must not touch the script's elements
+    render_messages(payment_notices, st)
+    render_messages(payment_log, st.sidebar)
+    st.sidebar.subheader("📋 Proposal Data Loading")
+    render_messages(proposal_log, st.sidebar)
+    
+    # Debug output is drawn from the cached details, so toggling it never reloads data
+    if DEBUG:
+        render_payment_debug(df, payment_debug)
+        if proposal_debug is not None:
+            render_proposal_debug(proposal_df, proposal_debug)
+    
+    return df, proposal_df
+
+# ===================== DOWNLOADS =====================
+def _arrow_csv_bytes(df):
+    """CSV bytes from pyarrow's columnar C++ writer"""
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    
+    # Date-only datetime columns are written as plain dates, like to_csv does
+    for i, col in enumerate(df.columns):
+        values = df[col]
+        if pd.api.types.is_datetime64_any_dtype(values) and (values.isna() | (values == values.dt.normalize())).all():
+            table = table.set_column(i, table.field(i).name, table.column(i).cast(pa.date32()))
+    
+    sink = pa.BufferOutputStream()
+    pacsv.write_csv(table, sink)
+    return sink.getvalue().to_pybytes()
+
+# Format -> (file extension, MIME type); the columnar formats need pyarrow
+DOWNLOAD_FORMATS = {"CSV": ("csv", "text/csv")}
+if pa is not None:
+    DOWNLOAD_FORMATS["Parquet"] = ("parquet", "application/vnd.apache.parquet")
+    DOWNLOAD_FORMATS["Feather"] = ("feather", "application/octet-stream")
+
+@st.cache_data(ttl=120, show_spinner=False, max_entries=32)
+def export_bytes(key, fmt, _df):
+    """Filtered frame serialised as fmt, cached on (source, load stamp, filter selections)"""
+    if fmt == "Parquet":
+        buffer = io.BytesIO()
+        _df.to_parquet(buffer, compression="snappy", index=False)
+        return buffer.getvalue()
+    
+    if fmt == "Feather":
+        buffer = io.BytesIO()
+        _df.reset_index(drop=True).to_feather(buffer)
+        return buffer.getvalue()
+    
+    if pa is not None:
+        try:
+            return _arrow_csv_bytes(_df)
+        except pa.ArrowException:
+            pass  # e.g. mixed-type object columns; pandas copes with those
+    
+    # Written as UTF-8 straight into the buffer, no intermediate str copy
+    buffer = io.BytesIO()
+    _df.to_csv(buffer, index=False, encoding="utf-8")
+    return buffer.getvalue()
+
+def render_download(label, filename, key, df, widget_key):
+    """Format picker plus download button for a filtered frame"""
+    fmt = st.radio("Download format", list(DOWNLOAD_FORMATS), horizontal=True, key=widget_key)
+    extension, mime = DOWNLOAD_FORMATS[fmt]
+    
+    # The file is only built on request; a new filter or format needs preparing again
+    prepared_key = f"{widget_key}_prepared"
+    if st.session_state.get(prepared_key) != (key, fmt):
+        if not st.button(f"⚙️ Prepare {label} {fmt}", key=f"{widget_key}_prepare"):
+            return
+        st.session_state[prepared_key] = (key, fmt)
+    
+    st.download_button(
+        f"📥 Download {label} {fmt}",
+        export_bytes(key, fmt, df),
+        f"{filename}.{extension}",
+        mime=mime,
+        type="primary"
+    )
+
+# ===================== RECORD TABLES =====================
+# Page sizes for long tables; anything up to the first fits on one page
+PAGE_SIZES = [500, 1000, 5000]
+
+# Fragments: touching a filter reruns only its own section, not the charts above it
+@st.fragment
+def payment_records_section(df):
+    """Payment filters, filtered records table and CSV download"""
+    # ===================== FILTERS SECTION =====================
+    st.markdown('<div class="section-header">🔍 Filter Records</div>', unsafe_allow_html=True)
+    
+    filter_col1, filter_col2, filter_col3, filter_col4 = st.columns(4)
+    filter_options = payment_filter_options(df.attrs.get('loaded_at'), df)
+    
+    with filter_col1:
+        # Status filter
+        status_options = filter_options['status']
+        selected_status = st.selectbox("Filter by Status", status_options, key="payment_status")
+    
+    with filter_col2:
+        # Payment mode filter
+        if "payment_mode" in df.columns:
+            mode_options = filter_options['mode']
+            selected_mode = st.selectbox("Filter by Payment Mode", mode_options, key="payment_mode_filter")
+        else:
+            selected_mode = "All"
+    
+    with filter_col3:
+        # Unit filter
+        if "unit_name" in df.columns:
+            unit_options = filter_options['unit']
+            selected_unit = st.selectbox("Filter by Unit", unit_options, key="payment_unit")
+        else:
+            selected_unit = "All"
+    
+    with filter_col4:
+        # Amount range filter
+        min_amount, max_amount = filter_options['amount_range']
+        amount_range = st.slider(
+            "Filter by Final Amount (₹)",
+            min_value=min_amount,
+            max_value=max_amount,
+            value=(min_amount, max_amount),
+            key="payment_amount"
+        )
+    
+    # Default state (no selection, full amount range): nothing to filter
+    if (selected_status == "All" and selected_mode == "All" and selected_unit == "All"
+            and tuple(amount_range) == (min_amount, max_amount)):
+        filtered_df = df
+    else:
+        # Apply filters: combine every condition into one mask and slice once
+        final_amount = df["final_amount"].to_numpy()
+        masks = [(final_amount >= amount_range[0]) & (final_amount <= amount_range[1])]
+        
+        if selected_status != "All":
+            masks.append((df["work_status"] == selected_status).to_numpy())
+        
+        if selected_mode != "All" and "payment_mode" in df.columns:
+            masks.append((df["payment_mode"] == selected_mode).to_numpy())
+        
+        if selected_unit != "All" and "unit_name" in df.columns:
+            masks.append((df["unit_name"] == selected_unit).to_numpy())
+        
+        # Nothing filtered out: keep the shared frame instead of gathering a full copy
+        mask = np.logical_and.reduce(masks)
+        filtered_df = df if mask.all() else df[mask]
+    
+    # ===================== RECORDS TABLE =====================
+    st.markdown('<div class="section-header">📋 Detailed Records</div>', unsafe_allow_html=True)
+    
+    # Display filtered results summary
+    st.metric("Filtered Records", len(filtered_df))
+    
+    # Data table with better styling
+    display_columns = []
+    for col in ['unit_name', 'work_order_no', 'order_amount', 'final_amount', 
+                'payment_received', 'pending_amount', 'payment_mode', 'work_status', 'date']:
+        if col in filtered_df.columns:
+            display_columns.append(col)
+    
+    if display_columns:
+        # Amounts stay numeric (and sortable); the browser applies the ₹ format
+        display_df = filtered_df[display_columns]
+        numeric_cols = ['order_amount', 'final_amount', 'payment_received', 'pending_amount']
+        
+        st.dataframe(
+            display_df,
+            column_config={
+                col: st.column_config.NumberColumn(format="₹ %,.2f")
+                for col in numeric_cols if col in display_df.columns
+            },
+            use_container_width=True,
+            height=400
+        )
+    else:
+        st.dataframe(filtered_df, use_container_width=True, height=400)
+    
+    # ===================== DOWNLOAD SECTION =====================
+    st.markdown("---")
+    render_download(
+        "Filtered", "filtered_payment_data",
+        ("payment", df.attrs.get('loaded_at'), selected_status, selected_mode, selected_unit, amount_range),
+        filtered_df,
+        "payment_download_format"
+    )
+
+@st.fragment
+def proposal_records_section(proposal_df):
+    """Proposal filters, filtered proposals table and CSV download"""
+    # ===================== PROPOSAL FILTERS SECTION =====================
+    st.markdown('<div class="section-header">🔍 Filter Proposals</div>', unsafe_allow_html=True)
     
-    return process_proposal_data(proposal_df)
+    filter_col1, filter_col2, filter_col3, filter_col4 = st.columns(4)
+    filter_options = proposal_filter_options(proposal_df.attrs.get('loaded_at'), proposal_df)
+    
+    with filter_col1:
+        # Status filter for proposals
+        if 'status' in proposal_df.columns:
+            proposal_status_options = filter_options['status']
+            selected_proposal_status = st.selectbox("Filter by Status", proposal_status_options, key="proposal_status")
+        else:
+            selected_proposal_status = "All"
+    
+    with filter_col2:
+        # Present Status filter
+        if 'present_status' in proposal_df.columns:
+            present_status_options = filter_options['present_status']
+            selected_present_status = st.selectbox("Filter by Present Status", present_status_options, key="present_status")
+        else:
+            selected_present_status = "All"
+    
+    with filter_col3:
+        # Client filter
+        if 'name' in proposal_df.columns:
+            client_options = filter_options['client']
+            selected_client = st.selectbox("Filter by Client", client_options, key="proposal_client")
+        else:
+            selected_client = "All"
+    
+    with filter_col4:
+        # Amount range filter for proposals
+        if 'amount' in proposal_df.columns:
+            prop_min, prop_max = filter_options['amount_range']
+            prop_range = st.slider(
+                "Filter by Amount (₹)",
+                min_value=prop_min,
+                max_value=prop_max,
+                value=(prop_min, prop_max),
+                key="proposal_amount_range"
+            )
+        else:
+            prop_range = (0, 100000000)
+    
+    # Default state (no selection, full amount range): nothing to filter
+    full_range = filter_options.get('amount_range')
+    if (selected_proposal_status == "All" and selected_present_status == "All" and selected_client == "All"
+            and (full_range is None or tuple(prop_range) == full_range)):
+        filtered_proposals = proposal_df
+    else:
+        # Apply proposal filters: one combined mask, one slice
+        mask = np.ones(len(proposal_df), dtype=bool)
+        
+        if selected_proposal_status != "All" and 'status' in proposal_df.columns:
+            mask &= (proposal_df['status'] == selected_proposal_status).to_numpy()
+        
+        if selected_present_status != "All" and 'present_status' in proposal_df.columns:
+            mask &= (proposal_df['present_status'] == selected_present_status).to_numpy()
+        
+        if selected_client != "All" and 'name' in proposal_df.columns:
+            mask &= (proposal_df['name'] == selected_client).to_numpy()
+        
+        if 'amount' in proposal_df.columns:
+            amount = proposal_df['amount'].to_numpy()
+            mask &= (amount >= prop_range[0]) & (amount <= prop_range[1])
+        
+        filtered_proposals = proposal_df[mask]
+    
+    # ===================== PROPOSAL DATA TABLE =====================
+    st.markdown('<div class="section-header">📋 Proposal Details</div>', unsafe_allow_html=True)
+    
+    # Display filtered proposal count
+    st.metric("Filtered Proposals", len(filtered_proposals))
+    
+    # Display proposal table with styling
+    if not filtered_proposals.empty:
+        # Select columns to display
+        display_cols = []
+        for col in ['s_no', 'sno', 'year', 'date', 'name', 'industry_type', 'district', 
+                   'scope_of_work', 'type', 'source', 'status', 'refrence_no', 
+                   'contact_person', 'amount', 'present_status']:
+            if col in filtered_proposals.columns:
+                display_cols.append(col)
+        display_cols = display_cols or list(filtered_proposals.columns)
+        
+        # Only one page of rows is formatted and sent to the browser; downloads keep every row
+        page_rows = filtered_proposals
+        if len(filtered_proposals) > PAGE_SIZES[0]:
+            page_col1, page_col2 = st.columns(2)
+            with page_col1:
+                page_size = st.selectbox("Rows per page", PAGE_SIZES, key="proposal_page_size")
+            page_count = -(-len(filtered_proposals) // page_size)
+            with page_col2:
+                # Unkeyed so it snaps back to page 1 whenever the page count changes
+                page = st.number_input("Page", min_value=1, max_value=page_count, value=1)
+            page_rows = filtered_proposals.iloc[(page - 1) * page_size:page * page_size]
+        
+        # Amount and dates stay typed (and sortable); the browser applies the display format
+        st.dataframe(
+            page_rows[display_cols],
+            column_config={
+                "amount": st.column_config.NumberColumn(format="₹ %,.2f"),
+                "date": st.column_config.DateColumn(format="DD-MM-YYYY"),
+            },
+            use_container_width=True,
+            height=500
+        )
+        
+        # Download button for proposals
+        st.markdown("---")
+        render_download(
+            "Filtered Proposals", "filtered_proposals_data",
+            ("proposals", proposal_df.attrs.get('loaded_at'), selected_proposal_status,
+             selected_present_status, selected_client, prop_range),
+            filtered_proposals.drop(columns='client_short', errors='ignore'),
+            "proposal_download_format"
+        )
+    else:
+        st.info("No proposals match the selected filters.")
 
 # ===================== MAIN APP =====================
 def main():
@@ -1043,14 +1695,16 @@ def main():
     # 🔄 REFRESH BUTTON
     if st.button("🔄 Refresh All Data", type="primary"):
         st.cache_data.clear()
+        get_payment_df.clear()
+        get_proposal_df.clear()
+        _recent_failure.clear()
+        _open_spreadsheet.clear()
+        _get_gspread_client.clear()
         st.rerun()
     
     # Load both datasets
-    with st.spinner("Loading payment data..."):
-        df = load_data()
-    
-    with st.spinner("Loading proposal data..."):
-        proposal_df = load_proposals()
+    with st.spinner("Loading payment and proposal data..."):
+        df, proposal_df = load_all()
     
     # ===================== PAYMENT DASHBOARD TAB =====================
     with tab1:
@@ -1058,48 +1712,17 @@ def main():
             st.warning("No payment data loaded. Please check your connection and try again.")
         else:
             # ===================== KPIs =====================
-            total_order = df["order_amount"].sum()
-            total_final = df["final_amount"].sum()
-            total_received = df["payment_received"].sum()
-            total_pending = df["pending_amount"].sum()
+            aggregates = aggregate_payments(df.attrs.get('loaded_at'), df)
+            total_order, total_final, total_received, total_pending = aggregates['totals']
             
             st.markdown('<div class="section-header">📈 Key Performance Indicators</div>', unsafe_allow_html=True)
             
-            st.markdown('<div class="kpi-row">', unsafe_allow_html=True)
-            col1, col2, col3, col4 = st.columns(4)
-            
-            with col1:
-                st.markdown(f"""
-                    <div class="metric-card">
-                        <div class="metric-title">Total Order Amount</div>
-                        <div class="metric-value">₹ {total_order:,.2f}</div>
-                    </div>
-                """, unsafe_allow_html=True)
-            
-            with col2:
-                st.markdown(f"""
-                    <div class="metric-card">
-                        <div class="metric-title">Total Final Amount</div>
-                        <div class="metric-value">₹ {total_final:,.2f}</div>
-                    </div>
-                """, unsafe_allow_html=True)
-            
-            with col3:
-                st.markdown(f"""
-                    <div class="metric-card">
-                        <div class="metric-title">Total Received</div>
-                        <div class="metric-value">₹ {total_received:,.2f}</div>
-                    </div>
-                """, unsafe_allow_html=True)
-            
-            with col4:
-                st.markdown(f"""
-                    <div class="metric-card">
-                        <div class="metric-title">Total Pending</div>
-                        <div class="metric-value">₹ {total_pending:,.2f}</div>
-                    </div>
-                """, unsafe_allow_html=True)
-            st.markdown('</div>', unsafe_allow_html=True)
+            render_kpi_row([
+                ("Total Order Amount", f"₹ {total_order:,.2f}"),
+                ("Total Final Amount", f"₹ {total_final:,.2f}"),
+                ("Total Received", f"₹ {total_received:,.2f}"),
+                ("Total Pending", f"₹ {total_pending:,.2f}"),
+            ])
             
             # ===================== PIE CHARTS SECTION =====================
             st.markdown('<div class="section-header">💰 Payment Analytics</div>', unsafe_allow_html=True)
@@ -1111,25 +1734,9 @@ def main():
                 st.markdown('<div class="chart-container">', unsafe_allow_html=True)
                 st.markdown("**Pending vs Received**")
                 
-                pie_df = pd.DataFrame({
-                    "Status": ["Received", "Pending"],
-                    "Amount": [total_received, total_pending]
-                })
-                
-                colors = ['#10B981', '#EF4444']
-                
-                fig = px.pie(pie_df, names="Status", values="Amount", hole=0.45,
-                            color_discrete_sequence=colors)
-                fig.update_layout(
-                    paper_bgcolor='rgba(0,0,0,0)',
-                    plot_bgcolor='rgba(0,0,0,0)',
-                    font_color="white",
-                    showlegend=True,
-                    legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1),
-                    height=400
-                )
-                fig.update_traces(textposition='inside', textinfo='percent+label')
-                st.plotly_chart(fig, use_container_width=True)
+                fig = make_donut(("Received", "Pending"), (total_received, total_pending),
+                                 "Status", "Amount", colors=('#10B981', '#EF4444'), hole=0.45)
+                st.plotly_chart(fig, use_container_width=True, key="payment_received_pie")
                 st.markdown('</div>', unsafe_allow_html=True)
             
             # Pie chart: Payment mode distribution
@@ -1137,23 +1744,15 @@ def main():
                 st.markdown('<div class="chart-container">', unsafe_allow_html=True)
                 st.markdown("**Payment Mode Distribution**")
                 
-                if "payment_mode" in df.columns and not df["payment_mode"].empty:
-                    mode_df = df.groupby("payment_mode")["payment_received"].sum().reset_index()
-                    mode_df = mode_df[mode_df["payment_received"] > 0]
+                if 'by_mode' in aggregates and not df["payment_mode"].empty:
+                    mode_df = aggregates['by_mode']
+                    mode_df = mode_df[mode_df > 0]
                     
                     if not mode_df.empty:
-                        fig2 = px.pie(mode_df, names="payment_mode", values="payment_received", 
-                                    hole=0.45, color_discrete_sequence=px.colors.qualitative.Set3)
-                        fig2.update_layout(
-                            paper_bgcolor='rgba(0,0,0,0)',
-                            plot_bgcolor='rgba(0,0,0,0)',
-                            font_color="white",
-                            showlegend=True,
-                            legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1),
-                            height=400
-                        )
-                        fig2.update_traces(textposition='inside', textinfo='percent+label')
-                        st.plotly_chart(fig2, use_container_width=True)
+                        fig2 = make_donut(tuple(mode_df.index), tuple(mode_df.tolist()),
+                                          "payment_mode", "payment_received",
+                                          colors=tuple(px.colors.qualitative.Set3), hole=0.45)
+                        st.plotly_chart(fig2, use_container_width=True, key="payment_mode_pie")
                     else:
                         st.info("No payment mode data available")
                 else:
@@ -1167,22 +1766,15 @@ def main():
                 st.markdown('<div class="chart-container">', unsafe_allow_html=True)
                 st.markdown("**Status-wise Pending Distribution**")
                 
-                status_pending = df.groupby("work_status")["pending_amount"].sum().reset_index()
-                status_pending = status_pending[status_pending["pending_amount"] > 0]
+                # Same per-status totals as the summary list beside it
+                status_pending = aggregates['by_status']["actual_pending"]
+                status_pending = status_pending[status_pending > 0]
                 
                 if not status_pending.empty:
-                    fig3 = px.pie(status_pending, names="work_status", values="pending_amount", 
-                                hole=0.45, color_discrete_sequence=px.colors.qualitative.Pastel)
-                    fig3.update_layout(
-                        paper_bgcolor='rgba(0,0,0,0)',
-                        plot_bgcolor='rgba(0,0,0,0)',
-                        font_color="white",
-                        showlegend=True,
-                        legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1),
-                        height=400
-                    )
-                    fig3.update_traces(textposition='inside', textinfo='percent+label')
-                    st.plotly_chart(fig3, use_container_width=True)
+                    fig3 = make_donut(tuple(status_pending.index), tuple(status_pending.tolist()),
+                                      "work_status", "pending_amount",
+                                      colors=tuple(px.colors.qualitative.Pastel), hole=0.45)
+                    st.plotly_chart(fig3, use_container_width=True, key="payment_status_pending_pie")
                 else:
                     st.info("No pending amounts by status")
                 st.markdown('</div>', unsafe_allow_html=True)
@@ -1192,25 +1784,20 @@ def main():
                 st.markdown('<div class="status-summary">', unsafe_allow_html=True)
                 st.markdown("**Status-wise Summary**")
                 
-                summary = df.groupby("work_status").agg(
-                    count=("work_status", "count"),
-                    actual_pending=("pending_amount", "sum"),
-                    total_final=("final_amount", "sum"),
-                    total_received=("payment_received", "sum")
-                ).reset_index()
+                summary = aggregates['by_status']
                 
-                for _, row in summary.iterrows():
-                    if row["work_status"].lower() == "completed":
+                for row in summary.itertuples():
+                    if row.Index.lower() == "completed":
                         pending_display = 0.0
                         status_color = "#10B981"
                     else:
-                        pending_display = row["actual_pending"]
+                        pending_display = row.actual_pending
                         status_color = "#F59E0B"
                     
                     st.markdown(f"""
                         <div class="status-item">
-                            <span style="color: {status_color}; font-weight: 600;">{row['work_status']}</span>
-                            <span>Count: {row['count']} | ₹ {pending_display:,.2f}</span>
+                            <span style="color: {status_color}; font-weight: 600;">{row.Index}</span>
+                            <span>Count: {row.count} | ₹ {pending_display:,.2f}</span>
                         </div>
                     """, unsafe_allow_html=True)
                 
@@ -1219,10 +1806,8 @@ def main():
             # ===================== YEARLY SUMMARY CHART =====================
             st.markdown('<div class="section-header">📅 Year-wise Summary</div>', unsafe_allow_html=True)
             
-            if 'year' in df.columns:
-                yearly_data = df.groupby('year')[
-                    ['order_amount', 'final_amount', 'payment_received', 'pending_amount']
-                ].sum().reset_index()
+            if 'by_year' in aggregates:
+                yearly_data = aggregates['by_year']
                 
                 if not yearly_data.empty:
                     st.markdown('<div class="chart-container">', unsafe_allow_html=True)
@@ -1241,101 +1826,11 @@ def main():
                         font_color="white",
                         legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1)
                     )
-                    st.plotly_chart(fig4, use_container_width=True)
+                    st.plotly_chart(fig4, use_container_width=True, key="payment_yearly_bar")
                     st.markdown('</div>', unsafe_allow_html=True)
             
-            # ===================== FILTERS SECTION =====================
-            st.markdown('<div class="section-header">🔍 Filter Records</div>', unsafe_allow_html=True)
-            
-            filter_col1, filter_col2, filter_col3, filter_col4 = st.columns(4)
-            
-            with filter_col1:
-                # Status filter
-                status_options = ["All"] + sorted(list(df["work_status"].unique()))
-                selected_status = st.selectbox("Filter by Status", status_options, key="payment_status")
-            
-            with filter_col2:
-                # Payment mode filter
-                if "payment_mode" in df.columns:
-                    mode_options = ["All"] + sorted(list(df["payment_mode"].unique()))
-                    selected_mode = st.selectbox("Filter by Payment Mode", mode_options, key="payment_mode_filter")
-                else:
-                    selected_mode = "All"
-            
-            with filter_col3:
-                # Unit filter
-                if "unit_name" in df.columns:
-                    unit_options = ["All"] + sorted(list(df["unit_name"].dropna().unique()))
-                    selected_unit = st.selectbox("Filter by Unit", unit_options, key="payment_unit")
-                else:
-                    selected_unit = "All"
-            
-            with filter_col4:
-                # Amount range filter
-                min_amount = float(df["final_amount"].min())
-                max_amount = float(df["final_amount"].max())
-                amount_range = st.slider(
-                    "Filter by Final Amount (₹)",
-                    min_value=min_amount,
-                    max_value=max_amount,
-                    value=(min_amount, max_amount),
-                    key="payment_amount"
-                )
-            
-            # Apply filters
-            filtered_df = df.copy()
-            if selected_status != "All":
-                filtered_df = filtered_df[filtered_df["work_status"] == selected_status]
-            
-            if selected_mode != "All" and "payment_mode" in filtered_df.columns:
-                filtered_df = filtered_df[filtered_df["payment_mode"] == selected_mode]
-            
-            if selected_unit != "All" and "unit_name" in filtered_df.columns:
-                filtered_df = filtered_df[filtered_df["unit_name"] == selected_unit]
-            
-            filtered_df = filtered_df[
-                (filtered_df["final_amount"] >= amount_range[0]) & 
-                (filtered_df["final_amount"] <= amount_range[1])
-            ]
-            
-            # ===================== RECORDS TABLE =====================
-            st.markdown('<div class="section-header">📋 Detailed Records</div>', unsafe_allow_html=True)
-            
-            # Display filtered results summary
-            st.metric("Filtered Records", len(filtered_df))
-            
-            # Data table with better styling
-            display_columns = []
-            for col in ['unit_name', 'work_order_no', 'order_amount', 'final_amount', 
-                        'payment_received', 'pending_amount', 'payment_mode', 'work_status', 'date']:
-                if col in filtered_df.columns:
-                    display_columns.append(col)
-            
-            if display_columns:
-                # Format numeric columns for display
-                display_df = filtered_df[display_columns].copy()
-                numeric_cols = ['order_amount', 'final_amount', 'payment_received', 'pending_amount']
-                for col in numeric_cols:
-                    if col in display_df.columns:
-                        display_df[col] = display_df[col].apply(lambda x: f"₹ {x:,.2f}")
-                
-                st.dataframe(
-                    display_df,
-                    use_container_width=True,
-                    height=400
-                )
-            else:
-                st.dataframe(filtered_df, use_container_width=True, height=400)
-            
-            # ===================== DOWNLOAD SECTION =====================
-            st.markdown("---")
-            csv = filtered_df.to_csv(index=False).encode("utf-8")
-            st.download_button(
-                "📥 Download Filtered CSV", 
-                csv, 
-                "filtered_payment_data.csv",
-                type="primary"
-            )
+            # Filters and the records table rerun on their own when a filter changes
+            payment_records_section(df)
     
     # ===================== PROPOSAL DASHBOARD TAB =====================
     with tab2:
@@ -1343,122 +1838,7 @@ def main():
         display_proposal_dashboard(proposal_df)
         
         if not proposal_df.empty:
-            # ===================== PROPOSAL FILTERS SECTION =====================
-            st.markdown('<div class="section-header">🔍 Filter Proposals</div>', unsafe_allow_html=True)
-            
-            filter_col1, filter_col2, filter_col3, filter_col4 = st.columns(4)
-            
-            with filter_col1:
-                # Status filter for proposals
-                if 'status' in proposal_df.columns:
-                    proposal_status_options = ["All"] + sorted(list(proposal_df['status'].dropna().unique()))
-                    selected_proposal_status = st.selectbox("Filter by Status", proposal_status_options, key="proposal_status")
-                else:
-                    selected_proposal_status = "All"
-            
-            with filter_col2:
-                # Present Status filter
-                if 'present_status' in proposal_df.columns:
-                    present_status_options = ["All"] + sorted(list(proposal_df['present_status'].dropna().unique()))
-                    selected_present_status = st.selectbox("Filter by Present Status", present_status_options, key="present_status")
-                else:
-                    selected_present_status = "All"
-            
-            with filter_col3:
-                # Client filter
-                if 'name' in proposal_df.columns:
-                    client_options = ["All"] + sorted(list(proposal_df['name'].dropna().unique()))
-                    selected_client = st.selectbox("Filter by Client", client_options, key="proposal_client")
-                else:
-                    selected_client = "All"
-            
-            with filter_col4:
-                # Amount range filter for proposals
-                if 'amount' in proposal_df.columns:
-                    prop_min = float(proposal_df['amount'].min())
-                    prop_max = float(proposal_df['amount'].max())
-                    prop_range = st.slider(
-                        "Filter by Amount (₹)",
-                        min_value=prop_min,
-                        max_value=prop_max,
-                        value=(prop_min, prop_max),
-                        key="proposal_amount_range"
-                    )
-                else:
-                    prop_range = (0, 100000000)
-            
-            # Apply proposal filters
-            filtered_proposals = proposal_df.copy()
-            
-            if selected_proposal_status != "All" and 'status' in filtered_proposals.columns:
-                filtered_proposals = filtered_proposals[filtered_proposals['status'] == selected_proposal_status]
-            
-            if selected_present_status != "All" and 'present_status' in filtered_proposals.columns:
-                filtered_proposals = filtered_proposals[filtered_proposals['present_status'] == selected_present_status]
-            
-            if selected_client != "All" and 'name' in filtered_proposals.columns:
-                filtered_proposals = filtered_proposals[filtered_proposals['name'] == selected_client]
-            
-            if 'amount' in filtered_proposals.columns:
-                filtered_proposals = filtered_proposals[
-                    (filtered_proposals['amount'] >= prop_range[0]) & 
-                    (filtered_proposals['amount'] <= prop_range[1])
-                ]
-            
-            # ===================== PROPOSAL DATA TABLE =====================
-            st.markdown('<div class="section-header">📋 Proposal Details</div>', unsafe_allow_html=True)
-            
-            # Display filtered proposal count
-            st.metric("Filtered Proposals", len(filtered_proposals))
-            
-            # Display proposal table with styling
-            if not filtered_proposals.empty:
-                # Format the display dataframe
-                display_proposal_df = filtered_proposals.copy()
-                
-                # Format numeric columns
-                if 'amount' in display_proposal_df.columns:
-                    display_proposal_df['amount'] = display_proposal_df['amount'].apply(
-                        lambda x: f"₹ {x:,.2f}" if pd.notnull(x) else "N/A"
-                    )
-                
-                # Format dates
-                date_columns = ['date', 'wo_date']
-                for date_col in date_columns:
-                    if date_col in display_proposal_df.columns:
-                        display_proposal_df[date_col] = display_proposal_df[date_col].apply(
-                            lambda x: x.strftime('%d-%m-%Y') if pd.notnull(x) else ''
-                        )
-                
-                # Select columns to display
-                display_cols = []
-                for col in ['s_no', 'sno', 'year', 'date', 'name', 'industry_type', 'district', 
-                           'scope_of_work', 'type', 'source', 'status', 'refrence_no', 
-                           'contact_person', 'amount', 'present_status']:
-                    if col in display_proposal_df.columns:
-                        display_cols.append(col)
-                
-                if display_cols:
-                    # Display the dataframe
-                    st.dataframe(
-                        display_proposal_df[display_cols],
-                        use_container_width=True,
-                        height=500
-                    )
-                else:
-                    st.dataframe(display_proposal_df, use_container_width=True, height=500)
-                
-                # Download button for proposals
-                st.markdown("---")
-                proposal_csv = filtered_proposals.to_csv(index=False).encode("utf-8")
-                st.download_button(
-                    "📥 Download Filtered Proposals CSV", 
-                    proposal_csv, 
-                    "filtered_proposals_data.csv",
-                    type="primary"
-                )
-            else:
-                st.info("No proposals match the selected filters.")
+            proposal_records_section(proposal_df)
     
     # ===================== FOOTER =====================
     st.markdown("---")
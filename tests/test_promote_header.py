@@ -0,0 +1,51 @@
+import sys
+import unittest
+from pathlib import Path
+from unittest import mock
+
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+import app  # noqa: E402
+
+# Duplicate "Amount" header, a blank-header column and a blank row
+CSV_BODY = b"Name,Amount,Amount,,Status\nA,1,10,x,OK\n,,,,\nB,2,20,y,Drop\n"
+EXPECTED_COLUMNS = ['Name', 'Amount', 'Status']
+EXPECTED_ROWS = [['A', '10', 'OK'], ['B', '20', 'Drop']]
+
+class PromoteHeaderTest(unittest.TestCase):
+    """Every sheet reader must agree on duplicate and blank headers"""
+
+    def assertExpected(self, df):
+        self.assertEqual(list(df.columns), EXPECTED_COLUMNS)
+        self.assertEqual(df.astype(object).values.tolist(), EXPECTED_ROWS)
+
+    def test_pyarrow_csv_path(self):
+        self.assertExpected(app._read_csv_body(CSV_BODY, 'utf-8'))
+
+    def test_c_engine_fallback(self):
+        read_csv = pd.read_csv
+
+        def no_pyarrow(*args, **kwargs):
+            if kwargs.get('engine') == 'pyarrow':
+                raise ImportError("pyarrow unavailable")
+            return read_csv(*args, **kwargs)
+
+        with mock.patch.object(app.pd, 'read_csv', side_effect=no_pyarrow):
+            self.assertExpected(app._read_csv_body(CSV_BODY, 'utf-8'))
+
+    def test_api_values_path(self):
+        # get_all_values matrix: trailing empty cells trimmed, so rows can be short
+        values = [
+            ['Name', 'Amount', 'Amount', '', 'Status'],
+            ['A', '1', '10', 'x', 'OK'],
+            [''],
+            ['B', '2', '20', 'y', 'Drop'],
+        ]
+        self.assertExpected(app.promote_header(pd.DataFrame(values)))
+
+    def test_empty(self):
+        self.assertTrue(app.promote_header(pd.DataFrame()).empty)
+
+if __name__ == '__main__':
+    unittest.main()
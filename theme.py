@@ -0,0 +1,27 @@
+# ===================== CUSTOM CSS FOR DARK THEME =====================
+THEME_CSS = """
+<style>
+    .main .block-container { padding-top: 2rem; background-color: #0E1117; }
+    .metric-card { background: linear-gradient(135deg, #1E293B 0%, #334155 100%); padding: 1.5rem; border-radius: 12px; border: 1px solid #374151; box-shadow: 0 4px 6px -1px rgba(0, 0, 0, 0.3); margin-bottom: 1rem; }
+    .metric-card:hover { transform: translateY(-2px); box-shadow: 0 6px 8px -1px rgba(0, 0, 0, 0.4); }
+    .metric-title { font-size: 0.9rem; font-weight: 600; color: #94A3B8; margin-bottom: 0.5rem; text-transform: uppercase; letter-spacing: 0.5px; }
+    .metric-value { font-size: 1.8rem; font-weight: 700; color: #FFFFFF; margin-bottom: 0; }
+    .section-header { font-size: 1.4rem; font-weight: 700; color: #FFFFFF; margin: 2rem 0 1rem 0; padding-bottom: 0.5rem; border-bottom: 2px solid #374151; }
+    .status-summary { background: #1E293B; padding: 1.5rem; border-radius: 12px; border: 1px solid #374151; margin-bottom: 1rem; }
+    .status-item { display: flex; justify-content: space-between; padding: 0.5rem 0; border-bottom: 1px solid #374151; }
+    .status-item:last-child { border-bottom: none; }
+    .chart-container { background: #1E293B; padding: 1.5rem; border-radius: 12px; border: 1px solid #374151; margin-bottom: 1rem; }
+    .kpi-row { display: flex; gap: 1rem; margin-bottom: 2rem; }
+    .kpi-row .metric-card { flex: 1; min-width: 0; margin-bottom: 0; }
+    /* Proposal status colors */
+    .status-approved { color: #10B981; font-weight: bold; }
+    .status-pending { color: #F59E0B; font-weight: bold; }
+    .status-rejected { color: #EF4444; font-weight: bold; }
+    .status-review { color: #8B5CF6; font-weight: bold; }
+    .status-ok { color: #10B981; font-weight: bold; }
+    .status-drop { color: #EF4444; font-weight: bold; }
+    .status-ongoing { color: #3B82F6; font-weight: bold; }
+    .status-others { color: #6B7280; font-weight: bold; }
+    .status-followup { color: #F59E0B; font-weight: bold; }
+</style>
+"""